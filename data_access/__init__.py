@@ -0,0 +1,43 @@
+"""Shared data access for the PRK Home Tuition pages.
+
+All pages read and write the spreadsheets through this package, so the client,
+the caches and the write paths exist once per process.
+"""
+from data_access.answers import BANK_MARKS, answer_id, grade_answers, resubmit_answer
+from data_access.backends import GspreadBackend, SheetBackend, SQLiteBackend, get_backend
+from data_access.batch import WriteBatch
+from data_access.config import (
+    ALL_USERS_SHEET_ID,
+    ANNOUNCEMENTS_SHEET_ID,
+    ANSWER_BANK_SHEET_ID,
+    DATE_FORMAT,
+    HOMEWORK_QUESTIONS_SHEET_ID,
+    MASTER_ANSWER_SHEET_ID,
+    SALARY_LEDGER_SHEET_ID,
+    SHEET_NAMES,
+    SUBSCRIPTION_PLANS,
+)
+from data_access.fake_gspread import FakeAPIError, FakeClient
+from data_access.homework import pending_homework
+from data_access.leaderboard import Leaderboard, class_leaderboard, get_leaderboard, student_rank, top_students
+from data_access.metrics import finish_rerun, get_metrics, start_rerun
+from data_access.reports import teacher_activity
+from data_access.mirror import MirrorBackend, MirrorSyncer
+from data_access.paging import paginate
+from data_access.profiling import get_profiler
+from data_access.quota import QuotaAwareBackend, TokenBucket
+from data_access.salary import record_points, salary_totals, with_salary_points
+from data_access.schema import typed_frame
+from data_access.store import (
+    BackgroundRefresher,
+    SheetCache,
+    get_cache,
+    invalidate,
+    load_data,
+    load_many,
+    refresh_stats,
+    sheet_version,
+    values_to_frame,
+)
+from data_access.users import fetch_user, find_user
+from data_access.writes import upsert_rows
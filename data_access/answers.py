@@ -0,0 +1,195 @@
+"""Saving grades and corrected answers in MASTER_ANSWER, and moving graded answers to ANSWER_BANK.
+
+Answers are addressed by answer_id(), built from the student, question and
+date, never by a Row ID kept from an old snapshot: every answer moved to the
+bank deletes a row and shifts the rows below it, so a stored row number can
+point at someone else's answer by the time it is used.
+
+An answer's row is taken from the current MASTER_ANSWER snapshot and checked
+against the sheet (one row_values, or one get_rows for several answers) just
+before it is written; the sheet is only read again in full if that check
+fails. The check and the writes by row number after it hold a short lock on
+MASTER_ANSWER's rows, so saves in this process cannot shift each other's rows
+in between. Everything else only holds the locks of the answers involved, so
+teachers grading different answers do not wait for each other. Other server
+processes are not covered: the Sheets API has no transactions.
+
+A move appends to the bank before the live row is deleted, and every step
+skips what is already done (an answer already in the bank is not appended
+again, one already graded or no longer live is not touched), so a save that
+failed part-way can simply be made again. The grading teacher's salary points
+are appended to the ledger once the grades are written; since answers already
+graded are skipped, repeating a save never pays twice.
+"""
+import threading
+from contextlib import ExitStack
+
+from data_access.backends import get_backend
+from data_access.batch import WriteBatch
+from data_access.config import ANSWER_BANK_SHEET_ID, MASTER_ANSWER_SHEET_ID
+from data_access.salary import record_points
+from data_access.store import get_cache, invalidate
+
+ANSWER_ID_COLUMNS = ['Student Gmail', 'Question', 'Date']
+# Marks that move an answer to the bank ("Very Good" and "Outstanding").
+BANK_MARKS = {4, 5}
+# Answers share this many locks, picked by their ID.
+LOCK_STRIPES = 64
+
+_answer_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+# Held from checking MASTER_ANSWER rows until the writes addressed by row number are sent.
+_rows_lock = threading.Lock()
+
+
+def answer_id(row):
+    """Returns the stable ID of an answer row (a Series or dict with the answer columns)."""
+    return tuple(str(row.get(col, "")) for col in ANSWER_ID_COLUMNS)
+
+
+def _holding(aids):
+    # Locks are always taken in the same order, so two saves sharing answers cannot deadlock.
+    stack = ExitStack()
+    for stripe in sorted({hash(aid) % LOCK_STRIPES for aid in aids}):
+        stack.enter_context(_answer_locks[stripe])
+    return stack
+
+
+def _header(snapshot):
+    return [str(h).strip() for h in snapshot.values[0]]
+
+
+def _padded(cells, width):
+    return list(cells[:width]) + [""] * (width - len(cells))
+
+
+def _confirmed(snapshot, numbers, backend):
+    """Reads the rows in `numbers` ({answer_id: [row numbers]}) back from the sheet.
+
+    Returns {answer_id: [(row number, cells)]}, or None if any of them no
+    longer holds its answer.
+    """
+    header = _header(snapshot)
+    cols = [header.index(col) for col in ANSWER_ID_COLUMNS]
+    wanted = {row: aid for aid, rows in numbers.items() for row in rows}
+    if len(wanted) == 1:
+        (row,) = wanted
+        actual = {row: backend.row_values(MASTER_ANSWER_SHEET_ID, row)}
+    else:
+        first = min(wanted)
+        tail = backend.get_rows(MASTER_ANSWER_SHEET_ID, first, len(header))
+        actual = {first + offset: cells for offset, cells in enumerate(tail)}
+    found = {}
+    for row, aid in sorted(wanted.items()):
+        cells = _padded(actual.get(row, []), len(header))
+        if tuple(cells[i] for i in cols) != aid:
+            return None
+        found.setdefault(aid, []).append((row, cells))
+    return found
+
+
+def _locate(aids, backend):
+    """Returns (header, {answer_id: [(row number, cells)]}) for those of `aids` still in MASTER_ANSWER."""
+    cache = get_cache()
+    snapshot = cache.peek(MASTER_ANSWER_SHEET_ID) or cache.get(MASTER_ANSWER_SHEET_ID)
+    if snapshot is not None and snapshot.values:
+        index = snapshot.rows_by(ANSWER_ID_COLUMNS)
+        numbers = {aid: index[aid] for aid in aids if aid in index}
+        if len(numbers) == len(aids):
+            found = _confirmed(snapshot, numbers, backend)
+            if found is not None:
+                return _header(snapshot), found
+    # An answer moved, is gone or is newer than the snapshot: read the sheet again.
+    invalidate(MASTER_ANSWER_SHEET_ID)
+    snapshot = cache.refresh(MASTER_ANSWER_SHEET_ID)
+    if snapshot is None or not snapshot.values:
+        return [], {}
+    header = _header(snapshot)
+    index = snapshot.rows_by(ANSWER_ID_COLUMNS)
+    return header, {
+        aid: [(row, _padded(snapshot.values[row - 1], len(header))) for row in index[aid]]
+        for aid in aids if aid in index
+    }
+
+
+def _banked(aids):
+    """Returns those of `aids` already in ANSWER_BANK, bringing its snapshot up to date first."""
+    if not aids:
+        return set()
+    # The bank is append-only, so this only fetches the rows added since the last sync.
+    invalidate(ANSWER_BANK_SHEET_ID)
+    snapshot = get_cache().refresh(ANSWER_BANK_SHEET_ID)
+    if snapshot is None:
+        return set()
+    index = snapshot.rows_by(ANSWER_ID_COLUMNS)
+    return {aid for aid in aids if aid in index}
+
+
+def grade_answers(grades, teacher_gmail=None, backend=None):
+    """Saves {answer_id: (marks, remarks)} and returns the IDs that were saved.
+
+    Answers whose marks are in BANK_MARKS move to ANSWER_BANK; the rest get
+    their marks and remarks written in place. Answers already graded, or no
+    longer in MASTER_ANSWER (moved by someone else or by an earlier call), are
+    left out of the result. With `teacher_gmail`, one salary point per saved
+    answer is recorded for that teacher. Safe to call again with the same
+    grades after a failure.
+    """
+    backend = backend or get_backend()
+    moving = {aid for aid, (marks, _) in grades.items() if marks in BANK_MARKS}
+    with _holding(grades):
+        in_bank = _banked(moving)
+        with _rows_lock:
+            header, live = _locate(grades, backend)
+            if not live:
+                return set()
+            marks_col = header.index('Marks') + 1
+            remarks_col = header.index('Remarks') + 1
+            batch = WriteBatch(backend)
+            saved = set()
+            for aid, rows in live.items():
+                # Only rows still waiting for a grade; an interrupted move never wrote its marks.
+                rows = [(row, cells) for row, cells in rows if not str(cells[marks_col - 1]).strip()]
+                if not rows:
+                    continue
+                marks, remarks = grades[aid]
+                if aid in moving:
+                    # A duplicate answer to the same question goes with it, but only once into the bank.
+                    if aid not in in_bank:
+                        banked = list(rows[0][1])
+                        banked[marks_col - 1], banked[remarks_col - 1] = marks, remarks
+                        batch.append_row(ANSWER_BANK_SHEET_ID, banked)
+                    for row, _ in rows:
+                        batch.delete_row(MASTER_ANSWER_SHEET_ID, row)
+                else:
+                    for row, _ in rows:
+                        batch.update_cell(MASTER_ANSWER_SHEET_ID, row, marks_col, marks)
+                        batch.update_cell(MASTER_ANSWER_SHEET_ID, row, remarks_col, remarks)
+                saved.add(aid)
+            # Updates, then bank appends, then live deletions (see WriteBatch.flush).
+            batch.flush()
+        # After the deletions, so a move that failed half-way is only paid when it is finished.
+        if teacher_gmail and saved:
+            with WriteBatch(backend) as batch:
+                for aid in saved:
+                    record_points(batch, teacher_gmail, 1, f"Graded: {aid[1]}")
+    return saved
+
+
+def resubmit_answer(aid, answer, backend=None):
+    """Replaces a live answer's text and clears its marks and remarks for re-grading.
+
+    Returns False if the answer is no longer in MASTER_ANSWER, i.e. it has
+    been moved to the bank meanwhile.
+    """
+    backend = backend or get_backend()
+    with _holding([aid]), _rows_lock:
+        header, live = _locate([aid], backend)
+        if aid not in live:
+            return False
+        batch = WriteBatch(backend)
+        for row, _ in live[aid]:
+            batch.update_cell(MASTER_ANSWER_SHEET_ID, row, header.index('Answer') + 1, answer)
+            batch.update_cell(MASTER_ANSWER_SHEET_ID, row, header.index('Marks') + 1, "")
+            batch.update_cell(MASTER_ANSWER_SHEET_ID, row, header.index('Remarks') + 1, "")
+        batch.flush()
+    return True
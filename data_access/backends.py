@@ -0,0 +1,433 @@
+"""Storage backends behind the shared load/save functions.
+
+Every backend exposes the same small, sheet-shaped interface: a sheet is a list
+of rows of strings, row 1 is the header and row/column numbers are 1-based, just
+like in Google Sheets. That keeps the page code identical whichever store is
+configured.
+"""
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+
+import streamlit as st
+
+from data_access.config import (
+    DATA_BACKEND,
+    FAKE_GSPREAD_ERROR_RATE,
+    FAKE_GSPREAD_LATENCY,
+    FAKE_GSPREAD_READS_PER_MINUTE,
+    FAKE_GSPREAD_SEED,
+    FAKE_GSPREAD_WRITES_PER_MINUTE,
+    INDEXED_COLUMNS,
+    MIRRORED_SHEETS,
+    SHEETS_CLIENT,
+    SQLITE_PATH,
+)
+
+
+def row_runs(rows):
+    """Returns the row numbers as (start, end) runs of adjacent rows, in ascending order."""
+    runs = []
+    for row in sorted(set(rows)):
+        if runs and runs[-1][1] == row - 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+    return [tuple(run) for run in runs]
+
+
+class SheetBackend:
+    """Interface every storage backend implements."""
+
+    name = "base"
+
+    def get_all_values(self, sheet_id):
+        """Returns every row of the sheet, header first."""
+        raise NotImplementedError
+
+    def get_rows(self, sheet_id, start_row, width):
+        """Returns rows from `start_row` to the end of the sheet, `width` columns wide."""
+        raise NotImplementedError
+
+    def get_revision(self, sheet_id):
+        """Returns a cheap token that changes whenever the sheet is modified."""
+        raise NotImplementedError
+
+    def row_values(self, sheet_id, row):
+        """Returns a single row of the sheet."""
+        raise NotImplementedError
+
+    def find_row(self, sheet_id, value):
+        """Returns the number of the first row containing `value`, or None."""
+        raise NotImplementedError
+
+    def update_cell(self, sheet_id, row, col, value):
+        raise NotImplementedError
+
+    def batch_update(self, sheet_id, updates):
+        """Writes several (row, col, values) blocks, where `values` is a 2-D list, in one request."""
+        for row, col, values in updates:
+            for r, row_values in enumerate(values):
+                for c, value in enumerate(row_values):
+                    self.update_cell(sheet_id, row + r, col + c, value)
+
+    def append_rows(self, sheet_id, rows):
+        raise NotImplementedError
+
+    def insert_row(self, sheet_id, values, index):
+        raise NotImplementedError
+
+    def delete_rows(self, sheet_id, start, end=None):
+        raise NotImplementedError
+
+    def delete_rows_at(self, sheet_id, rows):
+        """Deletes rows that need not be adjacent, numbered as they are before any deletion."""
+        for start, end in reversed(row_runs(rows)):
+            self.delete_rows(sheet_id, start, end)
+
+    def replace_all(self, sheet_id, values):
+        """Replaces the whole sheet, header included, with `values`."""
+        raise NotImplementedError
+
+    def append_row(self, sheet_id, values):
+        self.append_rows(sheet_id, [values])
+
+
+class GspreadBackend(SheetBackend):
+    """Reads and writes the first worksheet of each Google spreadsheet.
+
+    A sheet ID of the form "<spreadsheet id>#<title>" addresses the worksheet
+    with that title instead, which is created on first use.
+    """
+
+    name = "gspread"
+
+    def __init__(self, client):
+        self.client = client
+        self._worksheets = {}
+
+    def _worksheet(self, sheet_id):
+        # open_by_key costs a metadata request, so keep the handle around.
+        if sheet_id not in self._worksheets:
+            key, _, title = sheet_id.partition("#")
+            spreadsheet = self.client.open_by_key(key)
+            if not title:
+                self._worksheets[sheet_id] = spreadsheet.sheet1
+            else:
+                from gspread.exceptions import WorksheetNotFound
+
+                try:
+                    self._worksheets[sheet_id] = spreadsheet.worksheet(title)
+                except WorksheetNotFound:
+                    self._worksheets[sheet_id] = spreadsheet.add_worksheet(title, rows=1000, cols=10)
+        return self._worksheets[sheet_id]
+
+    def get_all_values(self, sheet_id):
+        return self._worksheet(sheet_id).get_all_values()
+
+    def get_rows(self, sheet_id, start_row, width):
+        from gspread.utils import rowcol_to_a1
+
+        last_col = rowcol_to_a1(1, max(width, 1)).rstrip("0123456789")
+        return self._worksheet(sheet_id).get_values(f"A{start_row}:{last_col}")
+
+    def get_revision(self, sheet_id):
+        # Drive metadata is a few hundred bytes, against megabytes for the values.
+        return self._worksheet(sheet_id).spreadsheet.get_lastUpdateTime()
+
+    def row_values(self, sheet_id, row):
+        return self._worksheet(sheet_id).row_values(row)
+
+    def find_row(self, sheet_id, value):
+        cell = self._worksheet(sheet_id).find(value)
+        return cell.row if cell else None
+
+    def update_cell(self, sheet_id, row, col, value):
+        self._worksheet(sheet_id).update_cell(row, col, value)
+
+    def batch_update(self, sheet_id, updates):
+        from gspread.utils import rowcol_to_a1
+
+        data = []
+        for row, col, values in updates:
+            end = rowcol_to_a1(row + len(values) - 1, col + max(len(v) for v in values) - 1)
+            data.append({'range': f"{rowcol_to_a1(row, col)}:{end}", 'values': values})
+        self._worksheet(sheet_id).batch_update(data, value_input_option='USER_ENTERED')
+
+    def append_rows(self, sheet_id, rows):
+        self._worksheet(sheet_id).append_rows(rows, value_input_option='USER_ENTERED')
+
+    def insert_row(self, sheet_id, values, index):
+        self._worksheet(sheet_id).insert_row(values, index)
+
+    def delete_rows(self, sheet_id, start, end=None):
+        self._worksheet(sheet_id).delete_rows(start, end)
+
+    def delete_rows_at(self, sheet_id, rows):
+        # One spreadsheets.batchUpdate, bottom run first so the others keep their numbers.
+        sheet = self._worksheet(sheet_id)
+        requests = [
+            {'deleteDimension': {'range': {
+                'sheetId': sheet.id, 'dimension': 'ROWS', 'startIndex': start - 1, 'endIndex': end,
+            }}}
+            for start, end in reversed(row_runs(rows))
+        ]
+        if requests:
+            sheet.spreadsheet.batch_update({'requests': requests})
+
+    def replace_all(self, sheet_id, values):
+        sheet = self._worksheet(sheet_id)
+        sheet.clear()
+        sheet.update(values)
+
+
+class SQLiteBackend(SheetBackend):
+    """Keeps every sheet in one local SQLite file, for offline work and load tests.
+
+    Rows are stored as JSON lists keyed by (sheet_id, row_num), so positional
+    operations such as update_cell and delete_rows behave like they do on a sheet.
+    Columns named in INDEXED_COLUMNS get a per-sheet expression index, which
+    find_rows() uses for equality lookups.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sheet_rows (sheet_id TEXT NOT NULL, row_num INTEGER NOT NULL, cells TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sheet_rows ON sheet_rows (sheet_id, row_num)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sheet_revisions (sheet_id TEXT PRIMARY KEY, revision INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        self._indexed = {}
+
+    def _written(self, sheet_id, op, args):
+        # Called inside the write's transaction, before it commits.
+        self._bump_revision(sheet_id)
+
+    def _bump_revision(self, sheet_id):
+        self._conn.execute(
+            "INSERT INTO sheet_revisions (sheet_id, revision) VALUES (?, 1) "
+            "ON CONFLICT(sheet_id) DO UPDATE SET revision = revision + 1",
+            (sheet_id,),
+        )
+
+    def _row_count(self, sheet_id):
+        cur = self._conn.execute("SELECT COALESCE(MAX(row_num), 0) FROM sheet_rows WHERE sheet_id = ?", (sheet_id,))
+        return cur.fetchone()[0]
+
+    def get_all_values(self, sheet_id):
+        with self._lock:
+            cur = self._conn.execute("SELECT cells FROM sheet_rows WHERE sheet_id = ? ORDER BY row_num", (sheet_id,))
+            rows = [json.loads(cells) for (cells,) in cur]
+        # Pad to a rectangle, as gspread's get_all_values does.
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def get_rows(self, sheet_id, start_row, width):
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT cells FROM sheet_rows WHERE sheet_id = ? AND row_num >= ? ORDER BY row_num", (sheet_id, start_row)
+            )
+            rows = [json.loads(cells)[:width] for (cells,) in cur]
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def get_revision(self, sheet_id):
+        with self._lock:
+            cur = self._conn.execute("SELECT revision FROM sheet_revisions WHERE sheet_id = ?", (sheet_id,))
+            found = cur.fetchone()
+            return found[0] if found else 0
+
+    def row_values(self, sheet_id, row):
+        with self._lock:
+            cur = self._conn.execute("SELECT cells FROM sheet_rows WHERE sheet_id = ? AND row_num = ?", (sheet_id, row))
+            found = cur.fetchone()
+            return json.loads(found[0]) if found else []
+
+    def find_row(self, sheet_id, value):
+        for row_num, row in enumerate(self.get_all_values(sheet_id), start=1):
+            if value in row:
+                return row_num
+        return None
+
+    def _set_cells(self, sheet_id, row, col, values):
+        cur = self._conn.execute("SELECT cells FROM sheet_rows WHERE sheet_id = ? AND row_num = ?", (sheet_id, row))
+        found = cur.fetchone()
+        cells = json.loads(found[0]) if found else []
+        cells.extend([""] * (col - 1 + len(values) - len(cells)))
+        for offset, value in enumerate(values):
+            cells[col - 1 + offset] = "" if value is None else str(value)
+        if found:
+            self._conn.execute(
+                "UPDATE sheet_rows SET cells = ? WHERE sheet_id = ? AND row_num = ?", (json.dumps(cells), sheet_id, row)
+            )
+        else:
+            self._conn.execute(
+                "INSERT INTO sheet_rows (sheet_id, row_num, cells) VALUES (?, ?, ?)", (sheet_id, row, json.dumps(cells))
+            )
+
+    def update_cell(self, sheet_id, row, col, value):
+        with self._lock:
+            self._set_cells(sheet_id, row, col, [value])
+            self._written(sheet_id, 'update_cell', (row, col, value))
+            self._conn.commit()
+
+    def batch_update(self, sheet_id, updates):
+        with self._lock:
+            for row, col, values in updates:
+                for offset, row_values in enumerate(values):
+                    self._set_cells(sheet_id, row + offset, col, row_values)
+            self._written(sheet_id, 'batch_update', (updates,))
+            self._conn.commit()
+
+    def append_rows(self, sheet_id, rows):
+        with self._lock:
+            next_row = self._row_count(sheet_id) + 1
+            self._conn.executemany(
+                "INSERT INTO sheet_rows (sheet_id, row_num, cells) VALUES (?, ?, ?)",
+                [(sheet_id, next_row + i, json.dumps([str(v) for v in row])) for i, row in enumerate(rows)],
+            )
+            self._written(sheet_id, 'append_rows', (rows,))
+            self._conn.commit()
+
+    def insert_row(self, sheet_id, values, index):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sheet_rows SET row_num = row_num + 1 WHERE sheet_id = ? AND row_num >= ?", (sheet_id, index)
+            )
+            self._conn.execute(
+                "INSERT INTO sheet_rows (sheet_id, row_num, cells) VALUES (?, ?, ?)",
+                (sheet_id, index, json.dumps([str(v) for v in values])),
+            )
+            self._written(sheet_id, 'insert_row', (values, index))
+            self._conn.commit()
+
+    def _remove_rows(self, sheet_id, start, end):
+        self._conn.execute(
+            "DELETE FROM sheet_rows WHERE sheet_id = ? AND row_num BETWEEN ? AND ?", (sheet_id, start, end)
+        )
+        self._conn.execute(
+            "UPDATE sheet_rows SET row_num = row_num - ? WHERE sheet_id = ? AND row_num > ?",
+            (end - start + 1, sheet_id, end),
+        )
+
+    def delete_rows(self, sheet_id, start, end=None):
+        end = start if end is None else end
+        with self._lock:
+            self._remove_rows(sheet_id, start, end)
+            self._written(sheet_id, 'delete_rows', (start, end))
+            self._conn.commit()
+
+    def _replace_rows(self, sheet_id, values):
+        self._conn.execute("DELETE FROM sheet_rows WHERE sheet_id = ?", (sheet_id,))
+        self._conn.executemany(
+            "INSERT INTO sheet_rows (sheet_id, row_num, cells) VALUES (?, ?, ?)",
+            [(sheet_id, i, json.dumps([str(v) for v in row])) for i, row in enumerate(values, start=1)],
+        )
+
+    def replace_all(self, sheet_id, values):
+        with self._lock:
+            self._replace_rows(sheet_id, values)
+            self._written(sheet_id, 'replace_all', (values,))
+            self._conn.commit()
+
+    def _ensure_indexes(self, sheet_id, header):
+        # One partial expression index per indexed column, keyed on its position
+        # in the header; a moved column simply gets a new index.
+        key = tuple(header)
+        if self._indexed.get(sheet_id) == key:
+            return
+        literal = sheet_id.replace("'", "''")
+        digest = hashlib.sha1(sheet_id.encode()).hexdigest()[:12]
+        with self._lock:
+            for pos, column in enumerate(header):
+                if column in INDEXED_COLUMNS:
+                    self._conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{digest}_{pos} ON sheet_rows (json_extract(cells, '$[{pos}]')) "
+                        f"WHERE sheet_id = '{literal}'"
+                    )
+            # Fresh statistics let the planner prefer these over the (sheet_id, row_num) index.
+            self._conn.execute("ANALYZE sheet_rows")
+            self._conn.commit()
+        self._indexed[sheet_id] = key
+
+    def find_rows(self, sheet_id, column, value):
+        """Returns [(row number, cells)] for the data rows whose `column` equals `value`."""
+        header = [str(h).strip() for h in self.row_values(sheet_id, 1)]
+        if column not in header:
+            return []
+        self._ensure_indexes(sheet_id, header)
+        pos = header.index(column)
+        # The sheet ID is inlined so the planner can match the partial index.
+        literal = sheet_id.replace("'", "''")
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT row_num, cells FROM sheet_rows WHERE sheet_id = '{literal}' "
+                f"AND json_extract(cells, '$[{pos}]') = ? AND row_num > 1 ORDER BY row_num",
+                (str(value),),
+            )
+            return [(row_num, json.loads(cells)) for row_num, cells in cur]
+
+
+def connect_to_gsheets():
+    """Authorizes a gspread client from the service account in st.secrets."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    try:
+        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+        decoded_creds = base64.b64decode(st.secrets["google_service"]["base64_credentials"])
+        credentials_dict = json.loads(decoded_creds)
+        credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
+        client = gspread.authorize(credentials)
+        return client
+    except Exception as e:
+        st.error(f"Error connecting to Google APIs: {e}")
+        return None
+
+
+def fake_client():
+    """Builds the in-memory gspread stand-in from the FAKE_GSPREAD_* settings."""
+    from data_access.fake_gspread import FakeClient
+
+    client = FakeClient(
+        latency=FAKE_GSPREAD_LATENCY,
+        reads_per_minute=FAKE_GSPREAD_READS_PER_MINUTE,
+        writes_per_minute=FAKE_GSPREAD_WRITES_PER_MINUTE,
+        error_rate=FAKE_GSPREAD_ERROR_RATE,
+    )
+    if FAKE_GSPREAD_SEED:
+        client.seed_from_json(FAKE_GSPREAD_SEED)
+    return client
+
+
+@st.cache_resource
+def get_backend():
+    """Returns the process-wide backend selected by DATA_BACKEND."""
+    if DATA_BACKEND == "sqlite":
+        return SQLiteBackend(SQLITE_PATH)
+    from data_access.quota import QuotaAwareBackend
+
+    client = fake_client() if SHEETS_CLIENT == "fake" else connect_to_gsheets()
+    if client is None:
+        return None
+    remote = QuotaAwareBackend(GspreadBackend(client))
+    if DATA_BACKEND != "mirror":
+        return remote
+    from data_access.mirror import MirrorBackend, MirrorSyncer
+
+    mirror = MirrorBackend(SQLITE_PATH, remote, MIRRORED_SHEETS)
+    # Bring over whatever the local file does not have yet before serving from it.
+    mirror.push()
+    for sheet_id in MIRRORED_SHEETS:
+        if not mirror.row_values(sheet_id, 1):
+            mirror.pull(sheet_id)
+    MirrorSyncer(mirror).start()
+    return mirror
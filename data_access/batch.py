@@ -0,0 +1,92 @@
+"""Collects the writes of one user action and sends them as few requests as possible."""
+from data_access.backends import get_backend
+from data_access.store import invalidate
+
+
+class WriteBatch:
+    """Queues cell and range updates, appended and inserted rows and row deletions for one user action.
+
+    On flush every sheet gets at most one batch_update, one append_rows and one
+    delete_rows_at, in that order, so updates and deletions can both use the
+    row numbers the sheet had before the batch. Inserted rows go last, one
+    insert_row each, numbered as the sheet is after the rest of the batch.
+
+    Use it as a context manager around a single user action:
+
+        with WriteBatch() as batch:
+            batch.update_cell(MASTER_ANSWER_SHEET_ID, row_id, marks_col, 4)
+            batch.update_cell(MASTER_ANSWER_SHEET_ID, row_id, remarks_col, "")
+
+    The batch is flushed when the block exits normally and discarded if it
+    raises, so call st.rerun() after the block, not inside it. Writing the same
+    cell twice keeps only the last value.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._cells = {}
+        self._ranges = {}
+        self._appends = {}
+        self._deletes = {}
+        self._inserts = {}
+
+    def update_cell(self, sheet_id, row, col, value):
+        self._cells.setdefault(sheet_id, {})[(row, col)] = value
+
+    def update_range(self, sheet_id, row, col, values):
+        """Queues a 2-D block of values whose top-left cell is (row, col)."""
+        self._ranges.setdefault(sheet_id, []).append((row, col, values))
+
+    def update_row(self, sheet_id, row, values):
+        self.update_range(sheet_id, row, 1, [list(values)])
+
+    def append_row(self, sheet_id, values):
+        """Queues a row to add at the bottom of the sheet."""
+        self._appends.setdefault(sheet_id, []).append(list(values))
+
+    def delete_row(self, sheet_id, row):
+        """Queues the deletion of a row, numbered as before the batch."""
+        self._deletes.setdefault(sheet_id, set()).add(row)
+
+    def insert_row(self, sheet_id, values, index):
+        """Queues a row to insert so that it becomes row `index`."""
+        self._inserts.setdefault(sheet_id, []).append((list(values), index))
+
+    def appended(self, sheet_id):
+        """Returns the rows queued for appending to `sheet_id`."""
+        return list(self._appends.get(sheet_id, []))
+
+    def pending(self):
+        """Returns the number of requests flush() would send."""
+        inserts = sum(len(rows) for rows in self._inserts.values())
+        return len(set(self._cells) | set(self._ranges)) + len(self._appends) + len(self._deletes) + inserts
+
+    def flush(self):
+        backend = self.backend or get_backend()
+        for sheet_id in list(dict.fromkeys([*self._ranges, *self._cells])):
+            updates = list(self._ranges.pop(sheet_id, []))
+            updates += [(row, col, [[value]]) for (row, col), value in self._cells.pop(sheet_id, {}).items()]
+            backend.batch_update(sheet_id, updates)
+            invalidate(sheet_id)
+        for sheet_id, rows in list(self._appends.items()):
+            backend.append_rows(sheet_id, rows)
+            del self._appends[sheet_id]
+            invalidate(sheet_id)
+        for sheet_id, rows in list(self._deletes.items()):
+            backend.delete_rows_at(sheet_id, sorted(rows))
+            del self._deletes[sheet_id]
+            invalidate(sheet_id)
+        for sheet_id, rows in list(self._inserts.items()):
+            while rows:
+                backend.insert_row(sheet_id, *rows[0])
+                rows.pop(0)
+            del self._inserts[sheet_id]
+            invalidate(sheet_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
@@ -0,0 +1,82 @@
+"""Sheet IDs and data-access settings shared by every page."""
+import os
+
+DATE_FORMAT = "%d-%m-%Y"
+# Plans offered at registration and the days each one pays for. The names are
+# stored in 'Subscription Plan', so renaming one breaks lookups for old rows.
+SUBSCRIPTION_PLANS = {
+    "₹1000 for 6 months (With Advance Classes)": 182,
+    "₹2000 for 1 year (With Advance Classes)": 365,
+    "₹200 for 30 days (Subjects Homework Only)": 30
+}
+
+# === SHEET IDs ===
+ALL_USERS_SHEET_ID = "18r78yFIjWr-gol6rQLeKuDPld9Rc1uDN8IQRffw68YA"
+HOMEWORK_QUESTIONS_SHEET_ID = "1fU_oJWR8GbOCX_0TRu2qiXIwQ19pYy__ezXPsRH61qI"
+MASTER_ANSWER_SHEET_ID = "1lW2Eattf9kyhllV_NzMMq9tznibkhNJ4Ma-wLV5rpW0"
+ANSWER_BANK_SHEET_ID = "12S2YwNPHZIVtWSqXaRHIBakbFqoBVB4xcAcFfpwN3uw"
+ANNOUNCEMENTS_SHEET_ID = "1zEAhoWC9_3UK09H4cFk6lRd6i5ChF3EknVc76L7zquQ"
+# A second tab of the users spreadsheet ("<spreadsheet id>#<worksheet title>").
+SALARY_LEDGER_SHEET_ID = ALL_USERS_SHEET_ID + "#Salary Ledger"
+# Display names for reports about the sheets themselves.
+SHEET_NAMES = {
+    ALL_USERS_SHEET_ID: "All Users",
+    HOMEWORK_QUESTIONS_SHEET_ID: "Homework Questions",
+    MASTER_ANSWER_SHEET_ID: "Master Answers",
+    ANSWER_BANK_SHEET_ID: "Answer Bank",
+    ANNOUNCEMENTS_SHEET_ID: "Announcements",
+    SALARY_LEDGER_SHEET_ID: "Salary Ledger",
+}
+
+# === CACHE & BACKEND SETTINGS ===
+# Seconds a loaded sheet is served from the cache before it is fetched again.
+CACHE_TTL = 60
+# Seconds between full reloads, even for sheets kept current by delta syncs.
+FULL_SYNC_INTERVAL = 15 * 60
+# A background thread re-syncs recently used sheets this many seconds before
+# their TTL runs out, so pages keep being served from memory.
+BACKGROUND_REFRESH = os.environ.get("BACKGROUND_REFRESH", "1") != "0"
+REFRESH_AHEAD = 10
+# Sheets nobody has read for this long are left alone by the refresher.
+HOT_SHEET_WINDOW = 10 * 60
+# If background refreshes keep failing, a snapshot older than this is synced in the foreground.
+MAX_STALE_AGE = 5 * 60
+# Sheets that only ever grow at the bottom, so a sync can fetch just the new rows.
+APPEND_ONLY_SHEETS = {ANSWER_BANK_SHEET_ID, HOMEWORK_QUESTIONS_SHEET_ID, SALARY_LEDGER_SHEET_ID}
+# Google Sheets allows 60 read and 60 write requests per minute per user.
+QUOTA_READS_PER_MINUTE = 60
+QUOTA_WRITES_PER_MINUTE = 60
+QUOTA_BURST = 10
+# Retries for 429 / 5xx responses, with jittered exponential backoff.
+QUOTA_MAX_RETRIES = 5
+# "gspread" talks to Google Sheets, "sqlite" uses a local database file instead
+# and "mirror" works on a local SQLite copy that is synced with Google Sheets.
+DATA_BACKEND = os.environ.get("DATA_BACKEND", "gspread").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "local_sheets.db")
+# "google" authorizes against the real API; "fake" uses the in-memory
+# FakeClient (see fake_gspread.py), seeded from FAKE_GSPREAD_SEED if set.
+SHEETS_CLIENT = os.environ.get("SHEETS_CLIENT", "google").lower()
+FAKE_GSPREAD_SEED = os.environ.get("FAKE_GSPREAD_SEED")
+FAKE_GSPREAD_LATENCY = float(os.environ.get("FAKE_GSPREAD_LATENCY", "0"))
+FAKE_GSPREAD_READS_PER_MINUTE = int(os.environ.get("FAKE_GSPREAD_READS_PER_MINUTE", "0")) or None
+FAKE_GSPREAD_WRITES_PER_MINUTE = int(os.environ.get("FAKE_GSPREAD_WRITES_PER_MINUTE", "0")) or None
+FAKE_GSPREAD_ERROR_RATE = float(os.environ.get("FAKE_GSPREAD_ERROR_RATE", "0"))
+# Columns the SQLite store indexes for find_rows() lookups.
+INDEXED_COLUMNS = {"Gmail ID", "Student Gmail", "Teacher Gmail", "Class", "Question", "Date"}
+# Sheets kept in the local copy when DATA_BACKEND is "mirror".
+MIRRORED_SHEETS = [
+    ALL_USERS_SHEET_ID, HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID,
+    ANSWER_BANK_SHEET_ID, ANNOUNCEMENTS_SHEET_ID, SALARY_LEDGER_SHEET_ID,
+]
+# Seconds between mirror sync rounds (push pending writes, pull external edits).
+MIRROR_SYNC_INTERVAL = 5
+# Failed pushes of one write before it is set aside in the mirror's dead-letter table.
+MIRROR_MAX_ATTEMPTS = 20
+# Sheets API calls, cache lookups and reruns kept for the Operations page (oldest dropped first).
+METRICS_MAX_EVENTS = 50_000
+# Profiling captures kept for download on the Operations page (oldest dropped first).
+PROFILE_MAX_CAPTURES = 50
+
+# === PAGE SETTINGS ===
+# Questions or answers shown at once in the pending homework, revision and grading queues.
+QUEUE_PAGE_SIZE = int(os.environ.get("QUEUE_PAGE_SIZE", "10"))
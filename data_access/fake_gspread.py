@@ -0,0 +1,278 @@
+"""An in-memory stand-in for the gspread client, for running the app without Google.
+
+FakeClient implements the part of the gspread surface GspreadBackend uses
+(open_by_key().sheet1 / worksheet() / add_worksheet(), get_all_values,
+get_values, row_values, find, update_cell, batch_update, append_row(s),
+insert_row, delete_rows, clear, update, get_lastUpdateTime and the spreadsheet
+batch_update with deleteDimension requests), so the real backend code paths
+run unchanged on top of it.
+
+Latency and quota errors can be injected to see how the app behaves under a
+slow or throttled API:
+
+    client = FakeClient(latency=0.3, reads_per_minute=60, error_rate=0.01)
+    client.seed(ALL_USERS_SHEET_ID, [["User Name", "Gmail ID", ...], ...])
+
+With DATA_BACKEND=fake, get_backend() builds one from FAKE_GSPREAD_* settings.
+"""
+import collections
+import json
+import random
+import re
+import threading
+import time
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    """Raised like gspread's APIError; `response.status_code` holds the HTTP status."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"{status_code}: {message}")
+        self.response = FakeResponse(status_code, {'Retry-After': str(retry_after)} if retry_after else {})
+
+
+class FakeCell:
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+def _a1_to_rowcol(label):
+    # "B3" -> (3, 2); "B" -> (None, 2); "3" -> (3, None)
+    match = re.fullmatch(r"([A-Za-z]*)(\d*)", label)
+    letters, digits = match.groups()
+    col = 0
+    for ch in letters.upper():
+        col = col * 26 + ord(ch) - 64
+    return (int(digits) if digits else None, col or None)
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = len(spreadsheet._worksheets)
+        self.rows = []
+
+    # --- reads ---
+    def get_all_values(self):
+        self.spreadsheet.client._request('read')
+        width = max((len(r) for r in self.rows), default=0)
+        return [list(r) + [""] * (width - len(r)) for r in self.rows]
+
+    def get_values(self, range_name=None):
+        self.spreadsheet.client._request('read')
+        if range_name is None:
+            return [list(r) for r in self.rows]
+        start, _, end = range_name.partition(":")
+        start_row, start_col = _a1_to_rowcol(start)
+        end_row, end_col = _a1_to_rowcol(end or start)
+        start_row, start_col = start_row or 1, start_col or 1
+        end_row = end_row or len(self.rows)
+        values = []
+        for row in self.rows[start_row - 1:end_row]:
+            cells = row[start_col - 1:end_col] if end_col else row[start_col - 1:]
+            values.append(list(cells))
+        # Like the API, trailing empty rows and cells are dropped.
+        values = [self._rstrip(r) for r in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def row_values(self, row):
+        self.spreadsheet.client._request('read')
+        return self._rstrip(list(self.rows[row - 1])) if row <= len(self.rows) else []
+
+    def find(self, query):
+        self.spreadsheet.client._request('read')
+        for r, row in enumerate(self.rows, start=1):
+            for c, value in enumerate(row, start=1):
+                if value == str(query):
+                    return FakeCell(r, c, value)
+        return None
+
+    # --- writes ---
+    def update_cell(self, row, col, value):
+        self.spreadsheet.client._request('write')
+        self._set(row, col, value)
+        self.spreadsheet._touch()
+
+    def batch_update(self, data, value_input_option=None):
+        self.spreadsheet.client._request('write')
+        for block in data:
+            start = block['range'].split(":")[0]
+            row, col = _a1_to_rowcol(start)
+            for r, values in enumerate(block['values']):
+                for c, value in enumerate(values):
+                    self._set(row + r, col + c, value)
+        self.spreadsheet._touch()
+
+    def append_rows(self, values, value_input_option=None):
+        self.spreadsheet.client._request('write')
+        # The API appends after the last non-empty row.
+        while self.rows and not any(str(v) for v in self.rows[-1]):
+            self.rows.pop()
+        self.rows.extend([self._cells(row) for row in values])
+        self.spreadsheet._touch()
+
+    def append_row(self, values, value_input_option=None):
+        self.append_rows([values], value_input_option)
+
+    def insert_row(self, values, index=1, value_input_option=None):
+        self.spreadsheet.client._request('write')
+        while len(self.rows) < index - 1:
+            self.rows.append([])
+        self.rows.insert(index - 1, self._cells(values))
+        self.spreadsheet._touch()
+
+    def delete_rows(self, start_index, end_index=None):
+        self.spreadsheet.client._request('write')
+        end_index = start_index if end_index is None else end_index
+        del self.rows[start_index - 1:end_index]
+        self.spreadsheet._touch()
+
+    def clear(self):
+        self.spreadsheet.client._request('write')
+        self.rows = []
+        self.spreadsheet._touch()
+
+    def update(self, values, range_name=None, **kwargs):
+        self.spreadsheet.client._request('write')
+        row, col = _a1_to_rowcol(range_name.split(":")[0]) if range_name else (1, 1)
+        for r, row_values in enumerate(values):
+            for c, value in enumerate(row_values):
+                self._set((row or 1) + r, (col or 1) + c, value)
+        self.spreadsheet._touch()
+
+    # --- helpers ---
+    @staticmethod
+    def _cells(values):
+        return ["" if v is None else str(v) for v in values]
+
+    @staticmethod
+    def _rstrip(row):
+        while row and row[-1] == "":
+            row.pop()
+        return row
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = "" if value is None else str(value)
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self._worksheets = {}
+        self._updated = 0
+        self.sheet1 = self.add_worksheet("Sheet1", rows=1000, cols=26, _counted=False)
+
+    def _touch(self):
+        self._updated += 1
+
+    def get_lastUpdateTime(self):
+        self.client._request('drive')
+        return str(self._updated)
+
+    def batch_update(self, body):
+        """Applies spreadsheets.batchUpdate requests; only deleteDimension on rows is supported."""
+        self.client._request('write')
+        sheets = {ws.id: ws for ws in self._worksheets.values()}
+        for request in body['requests']:
+            target = request['deleteDimension']['range']
+            del sheets[target['sheetId']].rows[target['startIndex']:target['endIndex']]
+        self._touch()
+        return {'replies': [{} for _ in body['requests']]}
+
+    def worksheet(self, title):
+        self.client._request('read')
+        if title not in self._worksheets:
+            from gspread.exceptions import WorksheetNotFound
+
+            raise WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, _counted=True):
+        if _counted:
+            self.client._request('write')
+        self._worksheets[title] = FakeWorksheet(self, title)
+        return self._worksheets[title]
+
+
+class FakeClient:
+    """In-memory gspread client with optional latency and quota errors.
+
+    latency / jitter: seconds slept per request (plus up to `jitter` more).
+    reads_per_minute / writes_per_minute: over this many requests in the last
+    60 seconds, requests fail with a 429 like the real API does.
+    error_rate: probability that any request fails with a 503 instead.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, reads_per_minute=None, writes_per_minute=None, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.limits = {'read': reads_per_minute, 'write': writes_per_minute}
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._spreadsheets = {}
+        self._recent = {'read': collections.deque(), 'write': collections.deque()}
+        self._lock = threading.Lock()
+        self.calls = collections.Counter()
+
+    def _request(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self._random.random() < self.error_rate
+            limit = self.limits.get(kind)
+            throttled = False
+            if limit is not None:
+                now = time.monotonic()
+                recent = self._recent[kind]
+                while recent and now - recent[0] >= 60:
+                    recent.popleft()
+                throttled = len(recent) >= limit
+                if not throttled:
+                    recent.append(now)
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            self.calls['throttled'] += 1
+            raise FakeAPIError(429, f"Quota exceeded for quota metric '{kind} requests' per minute", retry_after=1)
+        if fail:
+            self.calls['errors'] += 1
+            raise FakeAPIError(503, "The service is currently unavailable.")
+
+    def open_by_key(self, key):
+        self._request('read')
+        with self._lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = FakeSpreadsheet(self, key)
+            return self._spreadsheets[key]
+
+    def seed(self, sheet_id, values):
+        """Fills a sheet ("<key>" or "<key>#<title>") without counting requests."""
+        key, _, title = sheet_id.partition("#")
+        with self._lock:
+            spreadsheet = self._spreadsheets.setdefault(key, FakeSpreadsheet(self, key))
+            worksheet = spreadsheet.sheet1 if not title else spreadsheet._worksheets.setdefault(
+                title, FakeWorksheet(spreadsheet, title))
+        worksheet.rows = [FakeWorksheet._cells(row) for row in values]
+        spreadsheet._touch()
+
+    def seed_from_json(self, path):
+        """Seeds every sheet of a {sheet_id: [[cells]]} JSON file."""
+        with open(path) as f:
+            for sheet_id, values in json.load(f).items():
+                self.seed(sheet_id, values)
@@ -0,0 +1,78 @@
+"""Homework queries shared by the dashboards."""
+import pandas as pd
+import streamlit as st
+
+from data_access.config import ANSWER_BANK_SHEET_ID, HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID
+from data_access.store import load_data, load_many, query_rows, sheet_version
+
+ANSWER_KEY = ['Question', 'Date']
+
+
+def _filtered(df, column, value):
+    if df.empty or column not in df.columns:
+        return df
+    return df[df[column] == value]
+
+
+def pending_homework(student_gmail, student_class):
+    """Returns the class homework a student still has to answer or correct.
+
+    One row per pending question, newest first, indexed by the question's Row ID.
+    Besides the homework columns it carries the student's live 'Answer' and
+    'Remarks' (blank if not answered yet), the answer's 'Answer Row ID' in
+    MASTER_ANSWER (NaN if none) and 'Needs Correction'.
+    """
+    homework = query_rows(HOMEWORK_QUESTIONS_SHEET_ID, 'Class', student_class)
+    if homework is not None:
+        # A local backend answers from its indexes; no whole sheet is loaded.
+        return _pending(
+            homework,
+            query_rows(MASTER_ANSWER_SHEET_ID, 'Student Gmail', student_gmail),
+            query_rows(ANSWER_BANK_SHEET_ID, 'Student Gmail', student_gmail),
+        )
+    # Loading first brings the snapshots, and so their versions, up to date.
+    load_many([HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID, ANSWER_BANK_SHEET_ID])
+    return _pending_homework(
+        student_gmail, student_class,
+        sheet_version(HOMEWORK_QUESTIONS_SHEET_ID),
+        sheet_version(MASTER_ANSWER_SHEET_ID),
+        sheet_version(ANSWER_BANK_SHEET_ID),
+    )
+
+
+@st.cache_data(max_entries=1000)
+def _pending_homework(student_gmail, student_class, homework_version, live_version, bank_version):
+    # The versions are only part of the cache key: any change to the three
+    # sheets gives every student a fresh entry.
+    return _pending(
+        _filtered(load_data(HOMEWORK_QUESTIONS_SHEET_ID), 'Class', student_class),
+        _filtered(load_data(MASTER_ANSWER_SHEET_ID), 'Student Gmail', student_gmail),
+        _filtered(load_data(ANSWER_BANK_SHEET_ID), 'Student Gmail', student_gmail),
+    )
+
+
+def _pending(homework, live, banked):
+    # `homework` is the class's questions, `live` and `banked` the student's answers.
+    if not set(ANSWER_KEY) <= set(homework.columns):
+        return pd.DataFrame()
+    if homework.empty:
+        return pd.DataFrame(columns=list(homework.columns) + ['Answer', 'Remarks', 'Answer Row ID', 'Needs Correction'])
+
+    answer_cols = ANSWER_KEY + ['Answer', 'Remarks', 'Row ID']
+    live = pd.DataFrame(columns=answer_cols) if live.empty else live[answer_cols]
+    # A question answered twice is judged by its first answer, as before.
+    live = live.drop_duplicates(subset=ANSWER_KEY).rename(columns={'Row ID': 'Answer Row ID'})
+    banked = pd.DataFrame(columns=ANSWER_KEY) if banked.empty else banked[ANSWER_KEY].drop_duplicates()
+    banked = banked.assign(_in_bank=True)
+
+    merged = (
+        homework.merge(live, on=ANSWER_KEY, how='left')
+        .merge(banked, on=ANSWER_KEY, how='left')
+    )
+    merged.index = merged['Row ID'].values
+    merged['Answer'] = merged['Answer'].fillna("")
+    merged['Remarks'] = merged['Remarks'].fillna("")
+    merged['Needs Correction'] = merged['Remarks'].str.strip() != ""
+    answered = merged['Answer Row ID'].notna() | merged['_in_bank'].notna()
+    pending = merged[~answered | merged['Needs Correction']].drop(columns=['_in_bank'])
+    return pending.sort_values(by='Date_dt', ascending=False)
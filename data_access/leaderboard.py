@@ -0,0 +1,334 @@
+"""Student leaderboards kept up to date from the Answer Bank without recomputing them.
+
+Instead of merging the whole Answer Bank with the users and re-ranking it on
+every rerun, the process keeps running mark sums and counts per student, per
+class and per (class, subject). New Answer Bank rows (the bank is append-only,
+so a grade moving an answer there shows up as new rows on the next delta sync)
+are folded into those totals, and each group keeps its registered students in
+skip lists ordered by average, so a top-N or a single student's rank costs
+O(log n).
+
+The rows already folded in are fingerprinted with a running hash. A snapshot
+that does not extend the last one (a full sync, where earlier rows may have
+been edited or removed) is checked against it, and the totals are rebuilt if
+those rows changed.
+
+Students are grouped by the 'Class' recorded on their answers. Only gmails
+registered with the Student role are ranked; marks of anyone else are kept in
+the totals and ranked if they become a Student later.
+"""
+import hashlib
+import random
+import threading
+from itertools import islice
+
+import pandas as pd
+import streamlit as st
+
+from data_access.config import ALL_USERS_SHEET_ID, ANSWER_BANK_SHEET_ID
+from data_access.store import get_cache
+
+# Enough levels for a few million entries per group.
+_MAX_LEVELS = 24
+
+
+class _Node:
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value, levels):
+        self.value = value
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class _SkipList:
+    """Sorted distinct values with O(log n) expected insert, remove and position lookups."""
+
+    def __init__(self):
+        self._head = _Node(None, _MAX_LEVELS)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+    def _path(self, value):
+        # The last node before `value` on every level, and its position (1-based, head is 0).
+        chain = [None] * _MAX_LEVELS
+        positions = [0] * _MAX_LEVELS
+        node, position = self._head, 0
+        for level in reversed(range(_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].value < value:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level], positions[level] = node, position
+        return chain, positions
+
+    def add(self, value):
+        chain, positions = self._path(value)
+        levels = 1
+        while levels < _MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        node = _Node(value, levels)
+        position = positions[0] + 1
+        for level in range(levels):
+            before = chain[level]
+            node.next[level] = before.next[level]
+            before.next[level] = node
+            # Widths count the steps to the next node, or to one past the end.
+            node.width[level] = before.width[level] - (position - positions[level]) + 1
+            before.width[level] = position - positions[level]
+        for level in range(levels, _MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, value):
+        chain, _ = self._path(value)
+        node = chain[0].next[0]
+        if node is None or node.value != value:
+            raise KeyError(value)
+        for level in range(_MAX_LEVELS):
+            before = chain[level]
+            if level < len(node.next):
+                before.width[level] += node.width[level] - 1
+                before.next[level] = node.next[level]
+            else:
+                before.width[level] -= 1
+        self._size -= 1
+
+    def bisect_left(self, value):
+        """Returns how many values are smaller than `value`."""
+        _, positions = self._path(value)
+        return positions[0]
+
+
+class _RankedGroup:
+    """Students of one class (or class and subject), ordered by average mark."""
+
+    def __init__(self):
+        self.totals = {}              # gmail -> [sum, count], ranked or not
+        self._ranked = set()          # gmails in the ordering
+        self._order = _SkipList()     # (-average, gmail)
+        self._distinct = _SkipList()  # distinct -average, for dense ranks
+        self._ties = {}               # -average -> number of ranked students with it
+
+    def _key(self, gmail):
+        total = self.totals[gmail]
+        return -total[0] / total[1]
+
+    def add(self, gmail, marks, count, ranked):
+        """Adds `count` answers with `marks` in total to the student's running totals."""
+        if gmail in self._ranked:
+            self.hide(gmail)
+        total = self.totals.setdefault(gmail, [0.0, 0])
+        total[0] += marks
+        total[1] += count
+        if ranked:
+            self.show(gmail)
+
+    def show(self, gmail):
+        if gmail in self._ranked or gmail not in self.totals:
+            return
+        key = self._key(gmail)
+        self._order.add((key, gmail))
+        if key not in self._ties:
+            self._distinct.add(key)
+        self._ties[key] = self._ties.get(key, 0) + 1
+        self._ranked.add(gmail)
+
+    def hide(self, gmail):
+        if gmail not in self._ranked:
+            return
+        key = self._key(gmail)
+        self._order.remove((key, gmail))
+        self._ties[key] -= 1
+        if not self._ties[key]:
+            del self._ties[key]
+            self._distinct.remove(key)
+        self._ranked.discard(gmail)
+
+    def rank(self, gmail):
+        """Returns (dense rank, average) for the student, or None if not ranked."""
+        if gmail not in self._ranked:
+            return None
+        key = self._key(gmail)
+        return self._distinct.bisect_left(key) + 1, -key
+
+    def top(self, n=None):
+        """Yields (dense rank, gmail, average) from the best average down."""
+        rank, previous = 0, None
+        for key, gmail in islice(self._order, n):
+            if key != previous:
+                rank, previous = rank + 1, key
+            yield rank, gmail, -key
+
+
+def _fingerprint(digest, rows):
+    for row in rows:
+        cells = [str(cell) for cell in row]
+        # Tail fetches and full fetches pad trailing blanks differently.
+        while cells and cells[-1] == "":
+            cells.pop()
+        digest.update("\x1f".join(cells).encode() + b"\x1e")
+
+
+def _registered_students(users):
+    if users is None or users.frame.empty or 'Role' not in users.frame.columns:
+        return set()
+    frame = users.frame
+    return {gmail for gmail, row_id in users.lookup('Gmail ID').items() if frame.at[row_id, 'Role'] == 'Student'}
+
+
+class Leaderboard:
+    """Running totals for every class and (class, subject) group."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._students = set()
+        self._users = None
+        self._reset()
+
+    def _reset(self):
+        self._groups = {}
+        self._applied = 0       # Answer Bank data rows already folded in
+        self._last_row = None   # the last of them, as the row object of its snapshot
+        self._digest = hashlib.blake2b(digest_size=16)
+        self._version = None
+
+    def record(self, gmail, student_class, subject, marks, count=1):
+        """Adds graded answers to the student's class and class/subject totals."""
+        ranked = gmail in self._students
+        for key in ((student_class, None), (student_class, subject)):
+            self._groups.setdefault(key, _RankedGroup()).add(gmail, marks, count, ranked)
+
+    def _set_students(self, students):
+        joined, left = students - self._students, self._students - students
+        self._students = students
+        for group in self._groups.values():
+            for gmail in left:
+                group.hide(gmail)
+            for gmail in joined:
+                group.show(gmail)
+
+    def _extends(self, rows):
+        # True if the rows already folded in are still the first rows of `rows`.
+        if self._applied > len(rows):
+            return False
+        if not self._applied or rows[self._applied - 1] is self._last_row:
+            # A delta sync reuses the rows of the snapshot it extends.
+            return True
+        digest = hashlib.blake2b(digest_size=16)
+        _fingerprint(digest, rows[:self._applied])
+        return digest.digest() == self._digest.digest()
+
+    def sync(self, snapshot, users=None):
+        """Folds in the Answer Bank rows added since the last sync, or rebuilds if earlier rows changed.
+
+        `users` is the ALL_USERS snapshot that decides who is a registered Student.
+        """
+        with self._lock:
+            if users is not self._users:
+                self._set_students(_registered_students(users))
+                self._users = users
+            if snapshot is None or snapshot.version == self._version:
+                return
+            values = snapshot.values
+            rows = values[1:]
+            if not self._extends(rows):
+                self._reset()
+            added = rows[self._applied:]
+            if values:
+                header = [str(h).strip() for h in values[0]]
+                cols = [header.index(c) if c in header else None for c in ('Student Gmail', 'Class', 'Subject', 'Marks')]
+                if None not in cols:
+                    gmail_col, class_col, subject_col, marks_col = cols
+                    # Summed per student first, so each one is re-placed in its groups once.
+                    sums = {}
+                    for row in added:
+                        try:
+                            marks = float(row[marks_col])
+                        except (ValueError, IndexError):
+                            continue
+                        total = sums.setdefault((row[gmail_col], row[class_col], row[subject_col]), [0.0, 0])
+                        total[0] += marks
+                        total[1] += 1
+                    for (gmail, student_class, subject), (marks, count) in sums.items():
+                        self.record(gmail, student_class, subject, marks, count)
+            _fingerprint(self._digest, added)
+            self._applied = len(rows)
+            self._last_row = rows[-1] if rows else None
+            self._version = snapshot.version
+
+    def top(self, student_class, n=None, subject=None):
+        """Returns [(dense rank, gmail, average)] of a group from the best average down."""
+        # Readers hold the lock too: sync() splices the skip lists in place.
+        with self._lock:
+            group = self._groups.get((student_class, subject))
+            return [] if group is None else list(group.top(n))
+
+    def rank(self, gmail, student_class, subject=None):
+        """Returns (dense rank, average) for the student in a group, or None if not ranked."""
+        with self._lock:
+            group = self._groups.get((student_class, subject))
+            return None if group is None else group.rank(gmail)
+
+    def classes(self):
+        with self._lock:
+            return sorted({cls for cls, subject in self._groups if subject is None})
+
+
+@st.cache_resource
+def get_leaderboard():
+    """Returns the process-wide leaderboard; callers sync it before reading."""
+    return Leaderboard()
+
+
+def _synced_leaderboard():
+    board = get_leaderboard()
+    cache = get_cache()
+    board.sync(cache.get(ANSWER_BANK_SHEET_ID), cache.get(ALL_USERS_SHEET_ID))
+    return board
+
+
+def _user_names(gmails):
+    """Returns {gmail: User Name} for just `gmails`, through the snapshot's cached Gmail lookup."""
+    snapshot = get_cache().get(ALL_USERS_SHEET_ID)
+    if snapshot is None or snapshot.frame.empty:
+        return {}
+    rows = snapshot.lookup('Gmail ID')
+    return {gmail: snapshot.frame.at[rows[gmail], 'User Name'] for gmail in gmails if gmail in rows}
+
+
+def class_leaderboard(student_class, n=None, subject=None):
+    """Returns [Rank, Student Gmail, User Name, Marks] for a class, best first."""
+    top = _synced_leaderboard().top(student_class, n, subject)
+    names = _user_names(gmail for _, gmail, _ in top)
+    rows = [
+        {'Rank': rank, 'Student Gmail': gmail, 'User Name': names.get(gmail), 'Marks': round(avg, 2)}
+        for rank, gmail, avg in top
+    ]
+    return pd.DataFrame(rows, columns=['Rank', 'Student Gmail', 'User Name', 'Marks'])
+
+
+def top_students(n=3):
+    """Returns the top `n` registered students of every class: [Rank, User Name, Class, Marks]."""
+    board = _synced_leaderboard()
+    tops = [(student_class, board.top(student_class, n)) for student_class in board.classes()]
+    names = _user_names(gmail for _, top in tops for _, gmail, _ in top)
+    rows = [
+        {'Rank': rank, 'User Name': names.get(gmail), 'Class': student_class, 'Marks': round(avg, 2)}
+        for student_class, top in tops
+        for rank, gmail, avg in top
+    ]
+    return pd.DataFrame(rows, columns=['Rank', 'User Name', 'Class', 'Marks'])
+
+
+def student_rank(gmail, student_class, subject=None):
+    """Returns (dense rank, average marks) for the student in their class, or None."""
+    found = _synced_leaderboard().rank(gmail, student_class, subject)
+    return None if found is None else (found[0], round(found[1], 2))
@@ -0,0 +1,103 @@
+"""In-process metrics for Sheets API calls, cache lookups and page reruns.
+
+Every event goes into one bounded ring buffer shared by all sessions, tagged
+with the page and role of the rerun that caused it, so the Operations page can
+show which pages and actions hammer Google. The registry is a module-level
+object rather than an st.cache_resource, because API calls are also made from
+the parallel-load pool and the background refresher, which run outside the
+script thread.
+
+Pages bracket their body with start_rerun(page) and finish_rerun(). A rerun cut
+short by st.rerun() never reaches finish_rerun(); it is closed when the same
+session's next rerun starts, which follows immediately. The same two calls
+open and close profiling captures for users an admin has chosen to profile.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+import pandas as pd
+import streamlit as st
+
+from data_access.config import METRICS_MAX_EVENTS
+from data_access.profiling import PROFILER
+
+Event = namedtuple('Event', ['time', 'kind', 'name', 'sheet_id', 'duration', 'page', 'role', 'error'])
+
+_context = threading.local()
+
+
+class Metrics:
+    """A thread-safe ring buffer of the last `maxlen` events."""
+
+    def __init__(self, maxlen=METRICS_MAX_EVENTS):
+        self._events = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, kind, name, sheet_id=None, duration=0.0, error=None, page=None, role=None):
+        """Adds one event; page and role default to the current thread's rerun."""
+        if page is None and role is None:
+            page, role = current_context()
+        with self._lock:
+            self._events.append(Event(time.time(), kind, name, sheet_id, duration, page, role, error))
+
+    def events(self, kind=None, since=None):
+        with self._lock:
+            events = list(self._events)
+        return [e for e in events if (kind is None or e.kind == kind) and (since is None or e.time >= since)]
+
+    def frame(self, kind=None, since=None):
+        """Returns the events as a DataFrame with a datetime 'time' column."""
+        df = pd.DataFrame(self.events(kind, since), columns=Event._fields)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+        self.started = time.time()
+
+
+METRICS = Metrics()
+
+
+def current_context():
+    """Returns (page, role) of the rerun running on this thread, or the thread's own label."""
+    return getattr(_context, 'page', None), getattr(_context, 'role', None)
+
+
+def set_context(page, role):
+    _context.page, _context.role = page, role
+
+
+def record(kind, name, sheet_id=None, duration=0.0, error=None):
+    METRICS.record(kind, name, sheet_id, duration, error)
+
+
+def start_rerun(page):
+    """Marks the start of a rerun of `page`; every event on this thread is tagged with it."""
+    role = st.session_state.get('user_role') or 'anonymous'
+    now = time.perf_counter()
+    open_run = st.session_state.get('_metrics_rerun')
+    if open_run is not None:
+        # The previous rerun ended in st.rerun(), which started this one.
+        METRICS.record('rerun', open_run[0], duration=now - open_run[2], page=open_run[0], role=open_run[1])
+    st.session_state['_metrics_rerun'] = (page, role, now)
+    set_context(page, role)
+    PROFILER.begin(page, st.session_state.get('user_gmail'), role)
+
+
+def finish_rerun():
+    """Records the duration of the rerun started by start_rerun()."""
+    PROFILER.end()
+    open_run = st.session_state.pop('_metrics_rerun', None)
+    if open_run is not None:
+        page, role, started = open_run
+        METRICS.record('rerun', page, duration=time.perf_counter() - started, page=page, role=role)
+    set_context(None, None)
+
+
+def get_metrics():
+    """Returns the process-wide metrics registry."""
+    return METRICS
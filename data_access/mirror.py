@@ -0,0 +1,287 @@
+"""A local SQLite copy of the spreadsheets that the app reads and writes directly.
+
+With DATA_BACKEND=mirror every read and write hits the local database, so a
+grade or an answer no longer waits on Google. Each write is also recorded in an
+outbox table, in the same transaction, and a background MirrorSyncer replays
+the outbox against Google Sheets in order. Edits made by hand in the sheets are
+pulled back in when a sheet's Drive revision changes.
+
+A sheet is only pulled while it has no unpushed writes, so a local write is
+never overwritten by an older remote copy. Writes are positional, just like
+on the sheet; rows that staff insert or delete by hand while local writes are
+still pending can shift those writes, so the syncer keeps that window to a
+few seconds.
+
+A failed push may still have reached the sheet (a timeout or a 5xx after the
+write landed). Updates are simply sent again, but appends, inserts and
+deletions are not idempotent: before one of those is sent again, the remote
+is checked for it (see MirrorBackend._landed). A write the remote rejects for
+good (a 4xx other than 429), fails MIRROR_MAX_ATTEMPTS times or can no longer
+be applied safely is moved to a dead-letter table, shown on the Operations
+page, so it stops holding up the writes and pulls behind it; its sheet is then
+pulled again, since the local copy has the write and the remote does not.
+"""
+import json
+import threading
+import time
+
+from data_access import metrics
+from data_access.backends import SQLiteBackend
+from data_access.config import MIRROR_MAX_ATTEMPTS, MIRROR_SYNC_INTERVAL
+from data_access.quota import RETRYABLE_STATUS, _status_code
+
+
+def _trimmed(values):
+    # Sheets and SQLite pad rows differently; compare without trailing blanks.
+    rows = []
+    for row in values:
+        row = [str(v) for v in row]
+        while row and row[-1] == "":
+            row.pop()
+        rows.append(row)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class UnsafeReplay(Exception):
+    """A write that failed earlier can no longer be sent again safely."""
+
+
+class MirrorBackend(SQLiteBackend):
+    """SQLite store whose writes are queued for replay on a remote backend."""
+
+    name = "mirror"
+
+    def __init__(self, path, remote, sheet_ids):
+        super().__init__(path)
+        self.remote = remote
+        self.sheet_ids = list(sheet_ids)
+        # `expect` is what the remote should look like before the write, for checking a retry:
+        # the row count before an append, the rows a deletion removes.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, sheet_id TEXT NOT NULL, "
+            "op TEXT NOT NULL, args TEXT NOT NULL, expect TEXT, attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sync_outbox)")}
+        if 'expect' not in columns:
+            self._conn.execute("ALTER TABLE sync_outbox ADD COLUMN expect TEXT")
+        if 'attempts' not in columns:
+            self._conn.execute("ALTER TABLE sync_outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_dead_letter (id INTEGER PRIMARY KEY, sheet_id TEXT NOT NULL, "
+            "op TEXT NOT NULL, args TEXT NOT NULL, error TEXT, failed_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state (sheet_id TEXT PRIMARY KEY, remote_revision TEXT)"
+        )
+        self._conn.commit()
+        self._removed = None
+        self.stats = {'pushed': 0, 'pulled': 0, 'push_failures': 0, 'pull_failures': 0, 'dead_letters': 0,
+                      'last_push': None, 'last_pull': None, 'last_error': None}
+
+    def _remove_rows(self, sheet_id, start, end):
+        # Kept for _written, which runs right after in the same transaction.
+        cur = self._conn.execute(
+            "SELECT cells FROM sheet_rows WHERE sheet_id = ? AND row_num BETWEEN ? AND ? ORDER BY row_num",
+            (sheet_id, start, end),
+        )
+        self._removed = [json.loads(cells) for (cells,) in cur]
+        super()._remove_rows(sheet_id, start, end)
+
+    def _written(self, sheet_id, op, args):
+        super()._written(sheet_id, op, args)
+        expect = None
+        if op == 'append_rows':
+            expect = self._row_count(sheet_id) - len(args[0])
+        elif op == 'delete_rows':
+            expect, self._removed = self._removed, None
+        self._conn.execute(
+            "INSERT INTO sync_outbox (sheet_id, op, args, expect) VALUES (?, ?, ?, ?)",
+            (sheet_id, op, json.dumps(args, default=str), None if expect is None else json.dumps(expect)),
+        )
+
+    def pending(self, sheet_id=None):
+        """Returns the number of local writes not yet pushed to the remote."""
+        with self._lock:
+            if sheet_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM sync_outbox WHERE sheet_id = ?", (sheet_id,)).fetchone()[0]
+
+    def dead_letters(self):
+        """Returns the writes set aside because they could not be pushed, newest first."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT id, sheet_id, op, args, error, failed_at FROM sync_dead_letter ORDER BY id DESC"
+            )
+            return [
+                {'ID': op_id, 'Sheet': sheet_id, 'Write': op, 'Arguments': args, 'Error': error,
+                 'Failed At': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(failed_at))}
+                for op_id, sheet_id, op, args, error, failed_at in cur
+            ]
+
+    # --- push ---
+    def _landed(self, sheet_id, op, args, expect):
+        """Whether a non-idempotent write that failed before reached the remote anyway.
+
+        Raises UnsafeReplay if it did not, but sending it again could hit the wrong rows.
+        """
+        if expect is None and op in ('append_rows', 'delete_rows'):
+            return False  # queued before expectations were recorded
+        if op == 'append_rows':
+            rows = _trimmed(args[0])
+            tail = _trimmed(self.remote.get_rows(sheet_id, expect + 1, max(len(row) for row in args[0])))
+            return len(tail) >= len(rows) and tail[len(tail) - len(rows):] == rows
+        if op == 'insert_row':
+            values, index = args
+            return _trimmed([self.remote.row_values(sheet_id, index)]) == _trimmed([values])
+        if op == 'delete_rows':
+            start, _ = args
+            removed = _trimmed(expect)
+            width = max((len(row) for row in expect), default=1)
+            if _trimmed(self.remote.get_rows(sheet_id, start, width))[:len(removed)] == removed:
+                return False
+            remaining = _trimmed(self.remote.get_all_values(sheet_id))
+            if any(row in remaining for row in removed):
+                raise UnsafeReplay("the rows to delete have moved on the sheet")
+            return True
+        return False
+
+    def _set_aside(self, op_id, sheet_id, op, args, error):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_dead_letter (id, sheet_id, op, args, error, failed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (op_id, sheet_id, op, args, error, time.time()),
+            )
+            self._conn.execute("DELETE FROM sync_outbox WHERE id = ?", (op_id,))
+            # The local copy has a write the remote never got: pull it again once nothing is pending.
+            self._conn.execute("DELETE FROM sync_state WHERE sheet_id = ?", (sheet_id,))
+            self._conn.commit()
+        self.stats['dead_letters'] += 1
+
+    def _in_step(self, sheet_id):
+        # True if the remote has not changed since our last pull or push.
+        with self._lock:
+            found = self._conn.execute("SELECT remote_revision FROM sync_state WHERE sheet_id = ?", (sheet_id,)).fetchone()
+        return found is not None and found[0] == str(self.remote.get_revision(sheet_id))
+
+    def _record_revisions(self, in_step):
+        # Sheets nobody else touched get our push's revision, so the next pull need not fetch them.
+        for sheet_id, unchanged in in_step.items():
+            try:
+                revision = str(self.remote.get_revision(sheet_id)) if unchanged else None
+            except Exception:
+                revision = None
+            with self._lock:
+                if revision is None:
+                    self._conn.execute("DELETE FROM sync_state WHERE sheet_id = ?", (sheet_id,))
+                else:
+                    self._conn.execute(
+                        "UPDATE sync_state SET remote_revision = ? WHERE sheet_id = ?", (revision, sheet_id)
+                    )
+                self._conn.commit()
+
+    def push(self):
+        """Replays queued writes on the remote, oldest first.
+
+        A transient failure stops the round and the write is tried again next
+        time; one that fails for good is set aside and the round goes on.
+        """
+        in_step = {}
+        try:
+            while True:
+                with self._lock:
+                    found = self._conn.execute(
+                        "SELECT id, sheet_id, op, args, expect, attempts FROM sync_outbox ORDER BY id LIMIT 1"
+                    ).fetchone()
+                if found is None:
+                    return
+                op_id, sheet_id, op, args, expect, attempts = found
+                try:
+                    if sheet_id not in in_step:
+                        in_step[sheet_id] = self._in_step(sheet_id)
+                    expect = None if expect is None else json.loads(expect)
+                    if not (attempts and self._landed(sheet_id, op, json.loads(args), expect)):
+                        getattr(self.remote, op)(sheet_id, *json.loads(args))
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    self.stats['push_failures'] += 1
+                    self.stats['last_error'] = f"push {op} on {sheet_id}: {error}"
+                    status = _status_code(e)
+                    permanent = isinstance(e, UnsafeReplay) or (status is not None and status not in RETRYABLE_STATUS)
+                    if permanent or attempts + 1 >= MIRROR_MAX_ATTEMPTS:
+                        self._set_aside(op_id, sheet_id, op, args, error)
+                        in_step[sheet_id] = False
+                        continue
+                    with self._lock:
+                        self._conn.execute("UPDATE sync_outbox SET attempts = attempts + 1 WHERE id = ?", (op_id,))
+                        self._conn.commit()
+                    return
+                with self._lock:
+                    self._conn.execute("DELETE FROM sync_outbox WHERE id = ?", (op_id,))
+                    self._conn.commit()
+                self.stats['pushed'] += 1
+                self.stats['last_push'] = time.time()
+        finally:
+            self._record_revisions(in_step)
+
+    # --- pull ---
+    def pull(self, sheet_id):
+        """Copies the remote sheet over the local one if it changed and nothing is pending."""
+        if self.pending(sheet_id):
+            return False
+        try:
+            revision = str(self.remote.get_revision(sheet_id))
+            with self._lock:
+                found = self._conn.execute(
+                    "SELECT remote_revision FROM sync_state WHERE sheet_id = ?", (sheet_id,)
+                ).fetchone()
+            if found is not None and found[0] == revision:
+                return False
+            values = self.remote.get_all_values(sheet_id)
+        except Exception as e:
+            self.stats['pull_failures'] += 1
+            self.stats['last_error'] = f"pull {sheet_id}: {type(e).__name__}: {e}"
+            return False
+        changed = _trimmed(values) != _trimmed(self.get_all_values(sheet_id))
+        with self._lock:
+            # A write may have slipped in while we were fetching; it wins.
+            if self._conn.execute("SELECT 1 FROM sync_outbox WHERE sheet_id = ? LIMIT 1", (sheet_id,)).fetchone():
+                return False
+            if changed:
+                self._replace_rows(sheet_id, values)
+                self._bump_revision(sheet_id)
+            self._conn.execute(
+                "INSERT INTO sync_state (sheet_id, remote_revision) VALUES (?, ?) "
+                "ON CONFLICT(sheet_id) DO UPDATE SET remote_revision = excluded.remote_revision",
+                (sheet_id, revision),
+            )
+            self._conn.commit()
+        self.stats['last_pull'] = time.time()
+        if changed:
+            self.stats['pulled'] += 1
+        return changed
+
+    def sync(self):
+        """One round: push pending writes, then pull every sheet that changed remotely."""
+        self.push()
+        for sheet_id in self.sheet_ids:
+            self.pull(sheet_id)
+
+
+class MirrorSyncer(threading.Thread):
+    """Daemon thread running MirrorBackend.sync() every `interval` seconds."""
+
+    def __init__(self, mirror, interval=MIRROR_SYNC_INTERVAL):
+        super().__init__(name="sheet-mirror-sync", daemon=True)
+        self.mirror = mirror
+        self.interval = interval
+
+    def run(self):
+        metrics.set_context("Mirror sync", "system")
+        while True:
+            try:
+                self.mirror.sync()
+            except Exception as e:
+                self.mirror.stats['last_error'] = f"{type(e).__name__}: {e}"
+            time.sleep(self.interval)
@@ -0,0 +1,53 @@
+"""Paged work queues for the dashboards.
+
+A queue page is remembered by the sort key of its first row instead of by an
+offset. Grading or answering a question removes it from the queue; with an
+offset the rest of the queue would shift under the user and rows would be
+skipped. With a key the page starts where it did, at the next remaining row.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_access.config import QUEUE_PAGE_SIZE
+
+
+def _position(keys, cursor, by, ascending):
+    """Returns how many rows of the sorted `keys` come before `cursor`."""
+    probe = pd.DataFrame([cursor], columns=by, index=[-1])
+    combined = pd.concat([probe, keys.set_axis(range(len(keys)))])
+    # A stable sort keeps the probe ahead of rows with an equal key.
+    order = combined.sort_values(by=by, ascending=ascending, kind='mergesort').index
+    return int(np.flatnonzero(order == -1)[0])
+
+
+def paginate(df, key, by, ascending=True, page_size=QUEUE_PAGE_SIZE):
+    """Sorts `df` by `by` and returns the rows on the session's current page of it.
+
+    `key` names the queue in session state. `by` should identify a row, so
+    that the page's first row can be found again after the queue changes.
+    Above the page it renders the position in the queue and Previous/Next
+    buttons, when there is more than one page.
+    """
+    by = list(by)
+    # Sheet frames name their index 'Row ID' as well, which sort_values finds ambiguous.
+    ordered = df.rename_axis(None).sort_values(by=by, ascending=ascending, kind='mergesort')
+    state_key = f"_queue_{key}"
+    cursor = st.session_state.get(state_key)
+    start = 0 if cursor is None else _position(ordered[by], cursor, by, ascending)
+    if start >= len(ordered):
+        # The rows from the cursor on are gone: show the last page.
+        start = max(0, (len(ordered) - 1) // page_size * page_size)
+    page = ordered.iloc[start:start + page_size]
+    if len(ordered) <= page_size:
+        return page
+
+    col1, col2, col3 = st.columns([1, 4, 1])
+    col2.caption(f"Showing {start + 1}–{start + len(page)} of {len(ordered)}")
+    if col1.button("◀ Previous", key=f"{state_key}_previous", disabled=start == 0):
+        st.session_state[state_key] = tuple(ordered[by].iloc[max(0, start - page_size)])
+        st.rerun()
+    if col3.button("Next ▶", key=f"{state_key}_next", disabled=start + page_size >= len(ordered)):
+        st.session_state[state_key] = tuple(ordered[by].iloc[start + page_size])
+        st.rerun()
+    return page
@@ -0,0 +1,243 @@
+"""Opt-in cProfile and tracemalloc captures of one user's page reruns.
+
+An admin adds a user's Gmail ID on the Operations page; from then on every
+rerun of that user's session is profiled (start_rerun() and finish_rerun() in
+metrics.py open and close the capture) until the admin removes them again.
+For everyone else the cost is one set lookup per rerun.
+
+Each capture splits its CPU time into Sheets I/O, pandas work, widget
+rendering and app code by where the time was spent, keeps the peak traced
+memory and the largest allocation sites, and can be downloaded as a .pstats
+file or as folded stacks for flamegraph.pl and speedscope.
+
+Only one capture runs at a time: tracemalloc traces the whole process, and on
+Python 3.12+ only one cProfile profiler can be active at all. A rerun that
+starts while another user's is being captured is simply not profiled. Memory
+figures also include whatever other sessions allocated during the rerun.
+
+A rerun that raises, or is cut short by st.rerun() or st.stop(), never
+reaches finish_rerun(). Its script thread ends, and the next rerun to start
+in any session closes the capture it left open (marked as incomplete), so
+profiling never stays switched on for the rest of the process.
+"""
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from data_access.config import PROFILE_MAX_CAPTURES
+
+# Categories for a function's own time, by the path of its source file. Code
+# in this repository outside these files is app code; anything else (the
+# standard library, built-ins, other packages) counts towards its caller.
+CATEGORIES = [
+    ("Sheets I/O", ("data_access/backends.py", "data_access/quota.py", "data_access/fake_gspread.py", "gspread",
+                    "google", "requests", "urllib3", "http", "ssl", "socket", "sqlite3")),
+    ("pandas", ("pandas", "numpy")),
+    ("Rendering", ("streamlit", "plotly", "_plotly_utils", "altair", "pyarrow")),
+]
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))).replace(os.sep, "/")
+APP_CODE = "App code"
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+# Folded stacks deeper than this, or worth less than this share of the total time, are cut off.
+MAX_STACK_DEPTH = 60
+MIN_STACK_SHARE = 1e-3
+
+
+def _category(filename):
+    path = filename.replace(os.sep, "/")
+    for name, markers in CATEGORIES:
+        if any(f"/{marker}" in path for marker in markers):
+            return name
+    return APP_CODE if path.startswith(REPO_DIR + "/") else None
+
+
+def _categories(raw):
+    """Maps each function in pstats data to its category."""
+    categories = {func: _category(func[0]) for func in raw}
+
+    def resolve(func, seen):
+        # The busiest caller that leads somewhere, skipping recursion back into `seen`.
+        if categories[func] is None and func not in seen:
+            seen.add(func)
+            for caller, _ in sorted(raw[func][4].items(), key=lambda item: -item[1][3]):
+                if caller in raw and resolve(caller, seen):
+                    categories[func] = categories[caller]
+                    break
+        return categories[func]
+
+    for func in raw:
+        if resolve(func, set()) is None:
+            categories[func] = APP_CODE
+    return categories
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-ins such as <method 'sort' of 'list' objects>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def folded_stacks(stats, root=None):
+    """Returns `stats` as folded stacks ("caller;callee self_microseconds" lines).
+
+    cProfile only records caller/callee pairs, so the time a function spends
+    below itself is split over its callees in proportion to the time each
+    call site took. Branches worth less than MIN_STACK_SHARE of the total are
+    dropped, which keeps the number of paths through a dense call graph small.
+    `root`, if given, becomes the bottom frame of every stack.
+    """
+    raw = stats.stats  # {func: (cc, nc, tt, ct, {caller: (cc, nc, tt, ct)})}
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            if caller != func:
+                callees.setdefault(caller, []).append((func, edge[3]))
+    cutoff = stats.total_tt * MIN_STACK_SHARE
+    lines = {}
+
+    def walk(func, spent, stack, path):
+        cc, nc, tt, ct, _ = raw[func]
+        stack = stack + [_label(func)]
+        own = spent * min(tt / ct, 1.0) if ct else spent
+        if own * 1e6 >= 1:
+            key = ";".join(stack)
+            lines[key] = lines.get(key, 0) + int(own * 1e6)
+        below = callees.get(func, [])
+        weight = sum(edge_ct for _, edge_ct in below)
+        if not weight or len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_ct in below:
+            share = (spent - own) * edge_ct / weight
+            if callee not in path and share >= cutoff:
+                walk(callee, share, stack, path | {callee})
+
+    for func, entry in raw.items():
+        if not entry[4] and entry[3] >= cutoff:
+            walk(func, entry[3], [root] if root else [], {func})
+    return "".join(f"{stack} {us}\n" for stack, us in sorted(lines.items()))
+
+
+class Capture:
+    """One profiled rerun: summary figures plus the raw stats for download."""
+
+    def __init__(self, capture_id, page, gmail, role, started, wall, profile, peak, allocations, complete=True):
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        self.id = capture_id
+        self.page = page
+        self.gmail = gmail
+        self.role = role
+        self.started = started
+        self.wall = wall
+        # False if the rerun never reached finish_rerun(); `wall` then runs until the capture was closed.
+        self.complete = complete
+        self.cpu = stats.total_tt
+        self.categories = {name: 0.0 for name, _ in CATEGORIES}
+        self.categories[APP_CODE] = 0.0
+        categories = _categories(stats.stats)
+        for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+            self.categories[categories[func]] += tt
+        self.top_functions = [
+            {'Function': _label(func), 'Category': categories[func], 'Calls': nc,
+             'Own s': round(tt, 4), 'Total s': round(ct, 4)}
+            for func, (cc, nc, tt, ct, callers) in sorted(stats.stats.items(), key=lambda item: -item[1][3])
+        ][:TOP_FUNCTIONS]
+        self.peak_memory = peak
+        self.allocations = allocations
+        self.pstats = marshal.dumps(stats.stats)
+        self.folded = folded_stacks(stats, root=page)
+
+    def filename(self, extension):
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        return f"profile-{self.page.replace(' ', '_')}-{stamp}-{self.id}.{extension}"
+
+
+class _Active:
+    def __init__(self, page, gmail, role, owns_tracing):
+        self.page = page
+        self.gmail = gmail
+        self.role = role
+        self.owns_tracing = owns_tracing
+        self.thread = threading.current_thread()
+        self.profile = cProfile.Profile()
+        self.started = time.time()
+        self.clock = time.perf_counter()
+
+
+class Profiler:
+    """Which users are profiled, the capture in progress and the finished captures."""
+
+    def __init__(self, max_captures=PROFILE_MAX_CAPTURES):
+        self.targets = set()
+        self.captures = deque(maxlen=max_captures)
+        self.skipped = 0
+        self._active = {}    # thread ident -> _Active
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def begin(self, page, gmail, role):
+        """Starts capturing this thread's rerun if `gmail` is a target; returns whether it did."""
+        # Reruns cut short on this thread, or on script threads that have ended since
+        # (whose ident this thread may have been given).
+        self._finish(threading.get_ident(), complete=False)
+        self._close_orphans()
+        if gmail not in self.targets:
+            return False
+        with self._lock:
+            if self._active:
+                self.skipped += 1
+                return False
+            owns_tracing = not tracemalloc.is_tracing()
+            if owns_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            active = self._active[threading.get_ident()] = _Active(page, gmail, role, owns_tracing)
+        active.profile.enable()
+        return True
+
+    def end(self):
+        """Finishes this thread's capture, if it has one."""
+        return self._finish(threading.get_ident(), complete=True)
+
+    def _close_orphans(self):
+        for ident, active in list(self._active.items()):
+            if not active.thread.is_alive():
+                self._finish(ident, complete=False)
+
+    def _finish(self, ident, complete):
+        with self._lock:
+            active = self._active.pop(ident, None)
+            if active is None:
+                return None
+            active.profile.disable()
+            wall = time.perf_counter() - active.clock
+            peak = tracemalloc.get_traced_memory()[1]
+            allocations = [
+                {'Location': str(stat.traceback[0]), 'KiB': round(stat.size / 1024, 1), 'Blocks': stat.count}
+                for stat in tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+            ]
+            if active.owns_tracing:
+                tracemalloc.stop()
+        capture = Capture(next(self._ids), active.page, active.gmail, active.role, active.started, wall,
+                          active.profile, peak, allocations, complete)
+        self.captures.append(capture)
+        return capture
+
+    def find(self, capture_id):
+        return next((c for c in self.captures if c.id == capture_id), None)
+
+
+PROFILER = Profiler()
+
+
+def get_profiler():
+    """Returns the process-wide profiler."""
+    return PROFILER
@@ -0,0 +1,181 @@
+"""Keeps Sheets API usage inside quota when many sessions hit the same sheets.
+
+QuotaAwareBackend wraps another backend and adds three things:
+
+* identical reads already in flight are shared (single-flight), so a burst of
+  sessions whose cache expired together costs one request, not dozens;
+* reads and writes each draw from a token bucket sized to the per-minute
+  quota, so we wait a little instead of being rejected;
+* 429 and 5xx responses are retried with jittered exponential backoff. Row
+  deletions are only retried after a 429: after a 5xx the rows may already be
+  gone, and deleting by number again would remove the rows that moved up.
+
+Every request that reaches the API, retries included, is recorded in the
+metrics registry with its duration and error status.
+"""
+import random
+import threading
+import time
+
+from data_access import metrics
+from data_access.backends import SheetBackend
+from data_access.config import (
+    QUOTA_BURST,
+    QUOTA_MAX_RETRIES,
+    QUOTA_READS_PER_MINUTE,
+    QUOTA_WRITES_PER_MINUTE,
+)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# A 429 is rejected before anything is written, so even non-idempotent calls can be sent again.
+REJECTED_STATUS = {429}
+
+
+class TokenBucket:
+    """Lets `rate` calls per second through on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """Takes one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+
+def _status_code(error):
+    # gspread's APIError (and requests' HTTPError) carry the HTTP response.
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuotaAwareBackend(SheetBackend):
+    """Wraps `backend` with single-flight reads, rate limiting and retries."""
+
+    def __init__(self, backend, reads_per_minute=QUOTA_READS_PER_MINUTE, writes_per_minute=QUOTA_WRITES_PER_MINUTE,
+                 burst=QUOTA_BURST, max_retries=QUOTA_MAX_RETRIES, base_delay=1.0, max_delay=32.0):
+        self.backend = backend
+        self.name = backend.name
+        self.reads = TokenBucket(reads_per_minute / 60, burst)
+        self.writes = TokenBucket(writes_per_minute / 60, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0, 'retries': 0, 'failures': 0}
+
+    def _call(self, bucket, method, *args, retry_on=RETRYABLE_STATUS):
+        for attempt in range(self.max_retries + 1):
+            if bucket is not None:
+                bucket.acquire()
+            self.stats['calls'] += 1
+            start = time.perf_counter()
+            try:
+                result = getattr(self.backend, method)(*args)
+                metrics.record('api', method, args[0], time.perf_counter() - start)
+                return result
+            except Exception as e:
+                status = _status_code(e)
+                metrics.record('api', method, args[0], time.perf_counter() - start, error=status or type(e).__name__)
+                if status not in retry_on or attempt == self.max_retries:
+                    self.stats['failures'] += 1
+                    raise
+                self.stats['retries'] += 1
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                time.sleep(delay)
+
+    def _read(self, bucket, method, *args):
+        key = (method, args)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self.stats['coalesced'] += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._call(bucket, method, *args)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+    # --- reads ---
+    def get_all_values(self, sheet_id):
+        return self._read(self.reads, 'get_all_values', sheet_id)
+
+    def get_rows(self, sheet_id, start_row, width):
+        return self._read(self.reads, 'get_rows', sheet_id, start_row, width)
+
+    def get_revision(self, sheet_id):
+        # Revisions come from Drive metadata, which has its own, far larger quota.
+        return self._read(None, 'get_revision', sheet_id)
+
+    def row_values(self, sheet_id, row):
+        return self._read(self.reads, 'row_values', sheet_id, row)
+
+    def find_row(self, sheet_id, value):
+        return self._read(self.reads, 'find_row', sheet_id, value)
+
+    # --- writes (never coalesced) ---
+    def update_cell(self, sheet_id, row, col, value):
+        return self._call(self.writes, 'update_cell', sheet_id, row, col, value)
+
+    def batch_update(self, sheet_id, updates):
+        return self._call(self.writes, 'batch_update', sheet_id, updates)
+
+    def append_rows(self, sheet_id, rows):
+        return self._call(self.writes, 'append_rows', sheet_id, rows)
+
+    def insert_row(self, sheet_id, values, index):
+        return self._call(self.writes, 'insert_row', sheet_id, values, index)
+
+    def delete_rows(self, sheet_id, start, end=None):
+        return self._call(self.writes, 'delete_rows', sheet_id, start, end, retry_on=REJECTED_STATUS)
+
+    def delete_rows_at(self, sheet_id, rows):
+        return self._call(self.writes, 'delete_rows_at', sheet_id, rows, retry_on=REJECTED_STATUS)
+
+    def replace_all(self, sheet_id, values):
+        return self._call(self.writes, 'replace_all', sheet_id, values)
@@ -0,0 +1,51 @@
+"""Report tables for the Principal and Teacher dashboards, cached per data version."""
+import pandas as pd
+import streamlit as st
+
+from data_access.config import ALL_USERS_SHEET_ID, HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID
+from data_access.store import load_data, load_many, sheet_version
+
+STAFF_ROLES = ['Teacher', 'Admin', 'Principal']
+
+
+def teacher_activity(date_str):
+    """Returns one row per staff member: 'Created Today' questions and 'Pending Answers'.
+
+    'Pending Answers' counts the ungraded answers in MASTER_ANSWER to questions
+    the staff member uploaded. The table is shared by every viewer until one of
+    the underlying sheets changes.
+    """
+    load_many([ALL_USERS_SHEET_ID, HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID])
+    return _teacher_activity(
+        date_str,
+        sheet_version(ALL_USERS_SHEET_ID),
+        sheet_version(HOMEWORK_QUESTIONS_SHEET_ID),
+        sheet_version(MASTER_ANSWER_SHEET_ID),
+    )
+
+
+@st.cache_data(max_entries=50)
+def _teacher_activity(date_str, users_version, homework_version, live_version):
+    df_users = load_data(ALL_USERS_SHEET_ID)
+    df_homework = load_data(HOMEWORK_QUESTIONS_SHEET_ID)
+    df_live_answers = load_data(MASTER_ANSWER_SHEET_ID)
+
+    staff = df_users.loc[df_users['Role'].isin(STAFF_ROLES), ['User Name']].reset_index(drop=True)
+    if df_homework.empty:
+        return staff.assign(**{'Created Today': 0, 'Pending Answers': 0})
+
+    created = df_homework[df_homework['Date'] == date_str].groupby('Uploaded By').size()
+
+    # Map every ungraded answer to the author(s) of its question in one join,
+    # instead of scanning all answers once per teacher.
+    authors = df_homework[['Question', 'Uploaded By']].drop_duplicates()
+    if df_live_answers.empty:
+        pending = pd.Series(dtype='int64')
+    else:
+        ungraded = df_live_answers.loc[df_live_answers['Marks'].isna(), ['Question']]
+        pending = ungraded.merge(authors, on='Question').groupby('Uploaded By').size()
+
+    return staff.assign(**{
+        'Created Today': staff['User Name'].map(created).fillna(0).astype(int),
+        'Pending Answers': staff['User Name'].map(pending).fillna(0).astype(int),
+    })
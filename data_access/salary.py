@@ -0,0 +1,52 @@
+"""Teacher salary points, recorded as append-only ledger events.
+
+Grading used to read 'Salary Points' from a cached users frame, add one and
+write the cell back, so two teachers grading at once could lose increments.
+Each award is now a row appended to the Salary Ledger instead; a teacher's
+total is the legacy 'Salary Points' cell plus the sum of their ledger rows.
+"""
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from data_access.config import ALL_USERS_SHEET_ID, DATE_FORMAT, SALARY_LEDGER_SHEET_ID
+from data_access.store import get_cache, load_data, load_many, sheet_version
+
+LEDGER_HEADER = ['Date', 'Teacher Gmail', 'Points', 'Reason']
+
+
+def record_points(batch, teacher_gmail, points=1, reason=""):
+    """Queues a ledger row on `batch`; it is written when the batch flushes."""
+    if not batch.appended(SALARY_LEDGER_SHEET_ID):
+        snapshot = get_cache().get(SALARY_LEDGER_SHEET_ID)
+        if snapshot is not None and not snapshot.values:
+            batch.append_row(SALARY_LEDGER_SHEET_ID, LEDGER_HEADER)
+    batch.append_row(SALARY_LEDGER_SHEET_ID, [datetime.today().strftime(DATE_FORMAT), teacher_gmail, points, reason])
+
+
+def salary_totals():
+    """Returns every user's total salary points as a Series indexed by Gmail ID."""
+    load_many([ALL_USERS_SHEET_ID, SALARY_LEDGER_SHEET_ID])
+    return _salary_totals(sheet_version(ALL_USERS_SHEET_ID), sheet_version(SALARY_LEDGER_SHEET_ID))
+
+
+@st.cache_data(max_entries=10)
+def _salary_totals(users_version, ledger_version):
+    df_users = load_data(ALL_USERS_SHEET_ID)
+    df_ledger = load_data(SALARY_LEDGER_SHEET_ID)
+    if df_users.empty:
+        return pd.Series(dtype='int64')
+    legacy = df_users.drop_duplicates(subset='Gmail ID').set_index('Gmail ID')
+    legacy = legacy['Salary Points'] if 'Salary Points' in legacy.columns else pd.Series(0, index=legacy.index)
+    if df_ledger.empty or not {'Teacher Gmail', 'Points'} <= set(df_ledger.columns):
+        return legacy.astype('int64')
+    # A header row written twice reads back as a NaN 'Points' and is dropped here.
+    earned = df_ledger.dropna(subset=['Points']).groupby('Teacher Gmail')['Points'].sum()
+    return legacy.add(earned.reindex(legacy.index), fill_value=0).astype('int64')
+
+
+def with_salary_points(df_users):
+    """Returns a copy of `df_users` whose 'Salary Points' column holds the ledger totals."""
+    totals = salary_totals()
+    return df_users.assign(**{'Salary Points': df_users['Gmail ID'].map(totals).fillna(0).astype('int64')})
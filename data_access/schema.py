@@ -0,0 +1,69 @@
+"""Column types for each sheet, applied once whenever a snapshot is loaded.
+
+Pages get frames whose marks are already numeric, whose dates are already
+parsed and whose low-cardinality columns are categoricals, instead of
+re-parsing the same strings on every rerun. Text columns the pages compare with
+strings or write back to the sheets ('Date', 'Question', ...) keep their string
+values; parsed dates are added alongside as '<column>_dt'.
+"""
+import pandas as pd
+
+from data_access.config import (
+    ALL_USERS_SHEET_ID,
+    ANNOUNCEMENTS_SHEET_ID,
+    ANSWER_BANK_SHEET_ID,
+    DATE_FORMAT,
+    HOMEWORK_QUESTIONS_SHEET_ID,
+    MASTER_ANSWER_SHEET_ID,
+    SALARY_LEDGER_SHEET_ID,
+)
+
+DATE_SUFFIX = "_dt"
+
+_ANSWER_SCHEMA = {"numeric": ["Marks"], "dates": ["Date"], "categorical": ["Class", "Subject"]}
+
+SCHEMAS = {
+    ALL_USERS_SHEET_ID: {
+        "integer": ["Salary Points"],
+        "dates": ["Subscription Date", "Subscribed Till"],
+        "categorical": ["Role", "Class"],
+    },
+    HOMEWORK_QUESTIONS_SHEET_ID: {"dates": ["Date"], "categorical": ["Class", "Subject"]},
+    MASTER_ANSWER_SHEET_ID: _ANSWER_SCHEMA,
+    ANSWER_BANK_SHEET_ID: _ANSWER_SCHEMA,
+    ANNOUNCEMENTS_SHEET_ID: {"dates": ["Date"]},
+    SALARY_LEDGER_SHEET_ID: {"numeric": ["Points"], "dates": ["Date"]},
+}
+
+
+def _parse_dates(values):
+    """Parses DATE_FORMAT dates, falling back to lenient parsing for cells written another way."""
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    # Dates typed into the sheet by hand need not follow DATE_FORMAT; only blanks stay NaT.
+    retry = parsed.isna() & (values.astype(str).str.strip() != "")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format='mixed', dayfirst=True, errors='coerce')
+    return parsed
+
+
+def typed_frame(sheet_id, df):
+    """Returns `df` converted to the sheet's schema, indexed by its stable 'Row ID'."""
+    if df.empty:
+        return df
+    schema = SCHEMAS.get(sheet_id, {})
+    df = df.copy()
+    for col in schema.get("numeric", []):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in schema.get("integer", []):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
+    for col in schema.get("dates", []):
+        if col in df.columns:
+            df[col + DATE_SUFFIX] = _parse_dates(df[col])
+    for col in schema.get("categorical", []):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    df.index = pd.Index(df['Row ID'], name=None)
+    return df
+
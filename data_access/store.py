@@ -0,0 +1,388 @@
+"""Cached sheet reads shared by every page."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from data_access import metrics
+from data_access.backends import get_backend
+from data_access.config import (
+    APPEND_ONLY_SHEETS,
+    BACKGROUND_REFRESH,
+    CACHE_TTL,
+    FULL_SYNC_INTERVAL,
+    HOT_SHEET_WINDOW,
+    MAX_STALE_AGE,
+    REFRESH_AHEAD,
+)
+from data_access.schema import typed_frame
+
+
+def values_to_frame(all_values):
+    """Builds the frame the pages work on: stripped headers plus a 1-based 'Row ID'."""
+    if not all_values:
+        return pd.DataFrame()
+    df = pd.DataFrame(all_values[1:], columns=all_values[0])
+    df.columns = df.columns.str.strip()
+    df['Row ID'] = range(2, len(df) + 2)
+    return df
+
+
+def _same_row(a, b):
+    # Tail fetches and full fetches pad trailing blanks differently.
+    a, b = list(a), list(b)
+    while a and a[-1] == "": a.pop()
+    while b and b[-1] == "": b.pop()
+    return a == b
+
+
+class _Snapshot:
+    def __init__(self, sheet_id, values, revision):
+        self.values = values
+        self.revision = revision
+        # Typed once here, so every rerun of every session shares the parsed frame.
+        self.frame = typed_frame(sheet_id, values_to_frame(values))
+        self.checked_at = time.monotonic()
+        self.full_sync_at = self.checked_at
+        self.version = 0
+        self.stale = False
+        self._lookups = {}
+
+    def lookup(self, column):
+        """Returns {value: Row ID} for `column`, built once per snapshot; first match wins."""
+        if column not in self._lookups:
+            if self.frame.empty or column not in self.frame.columns:
+                self._lookups[column] = {}
+            else:
+                unique = self.frame.drop_duplicates(subset=column)
+                self._lookups[column] = dict(zip(unique[column], unique['Row ID']))
+        return self._lookups[column]
+
+    def rows_by(self, columns):
+        """Returns {tuple of `columns` values: [Row IDs]} for every row, built once per snapshot."""
+        key = tuple(columns)
+        if key not in self._lookups:
+            index = {}
+            if not self.frame.empty and set(columns) <= set(self.frame.columns):
+                keys = zip(*(self.frame[column].astype(str) for column in columns))
+                for values, row_id in zip(keys, self.frame['Row ID']):
+                    index.setdefault(values, []).append(int(row_id))
+            self._lookups[key] = index
+        return self._lookups[key]
+
+
+class SheetCache:
+    """Keeps the last snapshot of every sheet and brings it up to date cheaply.
+
+    Once a snapshot is older than CACHE_TTL, the sheet's revision is checked
+    first and an unchanged revision costs no data transfer at all. A changed
+    (or invalidated) append-only sheet only fetches the rows after the last one
+    it already has; anything else falls back to a full get_all_values().
+
+    With a background refresher running, an expired snapshot is still served
+    while the refresher syncs it (stale-while-revalidate), so a page only waits
+    on the API for a sheet it has never loaded or has just written to.
+    """
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._snapshots = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+        self._backend = None
+        self._refresher = None
+        self._accessed = {}
+        self._stats = {}
+        self._invalidations = {}
+
+    def _lock_for(self, sheet_id):
+        with self._guard:
+            return self._locks.setdefault(sheet_id, threading.Lock())
+
+    def _servable(self, snapshot, now):
+        # True if `snapshot` can be returned without waiting for a sync.
+        if snapshot is None or snapshot.stale:
+            return False
+        age = now - snapshot.checked_at
+        if age < self.ttl:
+            return True
+        if self._refresher is not None and self._refresher.is_alive() and age < MAX_STALE_AGE:
+            self._refresher.wake()
+            return True
+        return False
+
+    def _record_hit(self, sheet_id, snapshot, now):
+        # A snapshot past its TTL is served while the refresher syncs it.
+        metrics.record('cache', 'hit' if now - snapshot.checked_at < self.ttl else 'stale', sheet_id)
+
+    def _timed_refresh(self, sheet_id):
+        start = time.perf_counter()
+        try:
+            return self.refresh(sheet_id)
+        finally:
+            metrics.record('cache', 'miss', sheet_id, time.perf_counter() - start)
+
+    def get(self, sheet_id):
+        """Returns the current snapshot for `sheet_id`, syncing it if it is due."""
+        now = time.monotonic()
+        self._accessed[sheet_id] = now
+        snapshot = self._snapshots.get(sheet_id)
+        if self._servable(snapshot, now):
+            self._record_hit(sheet_id, snapshot, now)
+            return snapshot
+        if self._backend is None:
+            self._backend = get_backend()
+        return self._timed_refresh(sheet_id)
+
+    def peek(self, sheet_id):
+        """Returns the last snapshot of `sheet_id` as it is, without syncing it; None if never loaded."""
+        return self._snapshots.get(sheet_id)
+
+    def get_many(self, sheet_ids):
+        """Returns {sheet_id: snapshot or exception}, syncing the due sheets concurrently.
+
+        Every sheet is a separate spreadsheet, so one batched values request
+        cannot cover them; the round trips overlap on a thread pool instead.
+        """
+        now = time.monotonic()
+        results, due = {}, []
+        for sheet_id in dict.fromkeys(sheet_ids):
+            self._accessed[sheet_id] = now
+            snapshot = self._snapshots.get(sheet_id)
+            if self._servable(snapshot, now):
+                self._record_hit(sheet_id, snapshot, now)
+                results[sheet_id] = snapshot
+            else:
+                due.append(sheet_id)
+        if not due:
+            return results
+        if self._backend is None:
+            # Resolved here: st.cache_resource needs the script thread.
+            self._backend = get_backend()
+
+        # Pool threads tag their API calls with the rerun that asked for them.
+        context = metrics.current_context()
+
+        def sync(sheet_id):
+            metrics.set_context(*context)
+            try:
+                return self._timed_refresh(sheet_id)
+            except Exception as e:
+                return e
+
+        if len(due) == 1:
+            results[due[0]] = sync(due[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(due), thread_name_prefix="sheet-load") as pool:
+                results.update(zip(due, pool.map(sync, due)))
+        return results
+
+    def refresh(self, sheet_id, blocking=True):
+        """Syncs `sheet_id` now and returns its snapshot.
+
+        With blocking=False a sync already in flight is not waited for; the
+        current snapshot is returned instead.
+        """
+        lock = self._lock_for(sheet_id)
+        if not lock.acquire(blocking=blocking):
+            return self._snapshots.get(sheet_id)
+        try:
+            snapshot = self._snapshots.get(sheet_id)
+            now = time.monotonic()
+            # Someone else may have synced it while we waited for the lock.
+            if blocking and snapshot is not None and not snapshot.stale and now - snapshot.checked_at < self.ttl:
+                return snapshot
+            if self._backend is None:
+                return snapshot
+            stats = self._stats.setdefault(sheet_id, {'refreshes': 0, 'failures': 0, 'last_error': None})
+            invalidations = self._invalidations.get(sheet_id, 0)
+            try:
+                fresh = self._sync(self._backend, sheet_id, snapshot, now)
+            except Exception as e:
+                stats['failures'] += 1
+                stats['last_error'] = f"{type(e).__name__}: {e}"
+                raise
+            stats['refreshes'] += 1
+            # A write that landed while we were reading may be missing from `fresh`.
+            if self._invalidations.get(sheet_id, 0) != invalidations:
+                fresh.stale = True
+            if fresh is not snapshot:
+                fresh.version = snapshot.version + 1 if snapshot is not None else 1
+                self._snapshots[sheet_id] = fresh
+            return fresh
+        finally:
+            lock.release()
+
+    def _sync(self, backend, sheet_id, snapshot, now):
+        if snapshot is None or now - snapshot.full_sync_at >= FULL_SYNC_INTERVAL:
+            return self._full_load(backend, sheet_id)
+        revision = backend.get_revision(sheet_id)
+        # After our own write the revision may lag behind the data, so an
+        # invalidated snapshot always fetches; the revision is read first so a
+        # lagging one only causes an extra sync later, never a missed one.
+        if revision == snapshot.revision and not snapshot.stale:
+            snapshot.checked_at = now
+            return snapshot
+        if sheet_id in APPEND_ONLY_SHEETS and snapshot.values:
+            # Re-read the last known row too, to prove nothing above it moved.
+            last_row = len(snapshot.values)
+            tail = backend.get_rows(sheet_id, last_row, len(snapshot.values[0]))
+            if tail and _same_row(tail[0], snapshot.values[-1]):
+                fresh = _Snapshot(sheet_id, snapshot.values + tail[1:], revision)
+                fresh.full_sync_at = snapshot.full_sync_at
+                return fresh
+        return self._full_load(backend, sheet_id, revision)
+
+    def _full_load(self, backend, sheet_id, revision=None):
+        if revision is None:
+            revision = backend.get_revision(sheet_id)
+        return _Snapshot(sheet_id, backend.get_all_values(sheet_id), revision)
+
+    def due_for_refresh(self):
+        """Returns the recently read sheets whose snapshots expire within REFRESH_AHEAD seconds."""
+        now = time.monotonic()
+        due = []
+        for sheet_id, snapshot in list(self._snapshots.items()):
+            if now - self._accessed.get(sheet_id, 0) > HOT_SHEET_WINDOW:
+                continue
+            if snapshot.stale or now - snapshot.checked_at >= self.ttl - REFRESH_AHEAD:
+                due.append(sheet_id)
+        return due
+
+    def start_refresher(self, poll=5):
+        if self._refresher is None or not self._refresher.is_alive():
+            self._refresher = BackgroundRefresher(self, poll)
+            self._refresher.start()
+
+    def stats(self):
+        """Returns {sheet_id: {'age', 'version', 'in_flight', 'refreshes', 'failures', 'last_error'}}."""
+        now = time.monotonic()
+        report = {}
+        for sheet_id, snapshot in list(self._snapshots.items()):
+            report[sheet_id] = {
+                'age': round(now - snapshot.checked_at, 1),
+                'version': snapshot.version,
+                'in_flight': self._lock_for(sheet_id).locked(),
+                'refreshes': 0, 'failures': 0, 'last_error': None,
+                **self._stats.get(sheet_id, {}),
+            }
+        return report
+
+    def version(self, sheet_id):
+        snapshot = self._snapshots.get(sheet_id)
+        return snapshot.version if snapshot is not None else 0
+
+    def invalidate(self, sheet_id=None):
+        """Marks one sheet (or every sheet) as due for a sync on next access."""
+        with self._guard:
+            targets = [sheet_id] if sheet_id is not None else list(self._snapshots)
+            for target in targets:
+                self._invalidations[target] = self._invalidations.get(target, 0) + 1
+                if target in self._snapshots:
+                    self._snapshots[target].stale = True
+
+
+class BackgroundRefresher(threading.Thread):
+    """Daemon thread that keeps hot sheets synced ahead of their TTL."""
+
+    def __init__(self, cache, poll=5):
+        super().__init__(name="sheet-refresher", daemon=True)
+        self.cache = cache
+        self.poll = poll
+        self._wake = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        metrics.set_context("Background refresh", "system")
+        while True:
+            self._wake.wait(self.poll)
+            self._wake.clear()
+            for sheet_id in self.cache.due_for_refresh():
+                try:
+                    self.cache.refresh(sheet_id, blocking=False)
+                except Exception:
+                    # Counted in the cache stats; the old snapshot keeps being served.
+                    pass
+
+
+@st.cache_resource
+def get_cache():
+    """Returns the process-wide sheet cache, with its refresher started if enabled."""
+    cache = SheetCache()
+    if BACKGROUND_REFRESH:
+        cache.start_refresher()
+    return cache
+
+
+def load_data(sheet_id):
+    """Loads a whole sheet as a typed DataFrame (see schema.py), shared by all sessions.
+
+    The frame is the cached one itself, so treat it as read-only: filter it or
+    build new frames from it, but never assign columns or cells in place.
+    """
+    try:
+        snapshot = get_cache().get(sheet_id)
+        if snapshot is None: return pd.DataFrame()
+        return snapshot.frame
+    except Exception as e:
+        st.error(f"Failed to load data for sheet ID {sheet_id}: {e}")
+        return pd.DataFrame()
+
+
+def load_many(sheet_ids):
+    """Loads several sheets at once and returns {sheet_id: typed DataFrame}.
+
+    Sheets that are due are synced in parallel, so a cold page costs about one
+    round trip instead of one per sheet. The frames are the cached ones, as
+    with load_data.
+    """
+    try:
+        snapshots = get_cache().get_many(sheet_ids)
+    except Exception as e:
+        st.error(f"Failed to load data: {e}")
+        return {sheet_id: pd.DataFrame() for sheet_id in sheet_ids}
+    frames = {}
+    for sheet_id, snapshot in snapshots.items():
+        if isinstance(snapshot, Exception):
+            st.error(f"Failed to load data for sheet ID {sheet_id}: {snapshot}")
+            frames[sheet_id] = pd.DataFrame()
+        else:
+            frames[sheet_id] = snapshot.frame if snapshot is not None else pd.DataFrame()
+    return frames
+
+
+def query_rows(sheet_id, column, value):
+    """Returns the rows whose `column` equals `value` as a typed frame, straight from the backend's index.
+
+    Only local backends (SQLite, mirror) keep such an index; for any other
+    backend this returns None and callers filter the cached frame instead.
+    """
+    backend = get_backend()
+    if not hasattr(backend, 'find_rows'):
+        return None
+    header = [str(h).strip() for h in backend.row_values(sheet_id, 1)]
+    if not header:
+        return pd.DataFrame()
+    found = backend.find_rows(sheet_id, column, value)
+    df = values_to_frame([header] + [list(cells[:len(header)]) + [""] * (len(header) - len(cells)) for _, cells in found])
+    df['Row ID'] = [row_num for row_num, _ in found]
+    return typed_frame(sheet_id, df)
+
+
+def sheet_version(sheet_id):
+    """Returns a counter that increases every time the sheet's cached content changes."""
+    return get_cache().version(sheet_id)
+
+
+def refresh_stats():
+    """Returns per-sheet snapshot age, refresh and failure counts (see SheetCache.stats)."""
+    return get_cache().stats()
+
+
+def invalidate(sheet_id=None):
+    """Marks cached sheets as due for a sync; with no argument, every sheet."""
+    get_cache().invalidate(sheet_id)
@@ -0,0 +1,59 @@
+"""User lookups served from the cached ALL_USERS snapshot, or from a local backend's Gmail index."""
+import streamlit as st
+
+from data_access.backends import get_backend
+from data_access.config import ALL_USERS_SHEET_ID
+from data_access.schema import typed_frame
+from data_access.store import _same_row, get_cache, invalidate, query_rows, values_to_frame
+
+
+def find_user(gmail):
+    """Returns the user's row (with its 'Row ID') or None, via the Gmail index."""
+    try:
+        found = query_rows(ALL_USERS_SHEET_ID, 'Gmail ID', gmail)
+        if found is not None:
+            return None if found.empty else found.iloc[0]
+        snapshot = get_cache().get(ALL_USERS_SHEET_ID)
+        if snapshot is None:
+            return None
+        row_id = snapshot.lookup('Gmail ID').get(gmail)
+        return None if row_id is None else snapshot.frame.loc[row_id]
+    except Exception as e:
+        st.error(f"Failed to look up user {gmail}: {e}")
+        return None
+
+
+def fetch_user(gmail):
+    """Returns the user's row read live from the sheet, for checks that must not be stale.
+
+    Login uses this instead of dropping the whole cache: the cached Gmail index
+    points at the row and only that row is fetched. If the row no longer holds
+    this user (rows moved since the snapshot) the users sheet is synced and
+    the cached row returned; a changed row marks the sheet for a sync. A local
+    backend is simply asked, since its index is never stale.
+    """
+    try:
+        found = query_rows(ALL_USERS_SHEET_ID, 'Gmail ID', gmail)
+        if found is not None:
+            return None if found.empty else found.iloc[0]
+        snapshot = get_cache().get(ALL_USERS_SHEET_ID)
+        backend = get_backend()
+        if snapshot is None or backend is None or not snapshot.values:
+            return None
+        row_id = snapshot.lookup('Gmail ID').get(gmail)
+        if row_id is None:
+            return None
+        header = [str(h).strip() for h in snapshot.values[0]]
+        values = backend.row_values(ALL_USERS_SHEET_ID, row_id)
+        values = list(values[:len(header)]) + [""] * (len(header) - len(values))
+        if 'Gmail ID' not in header or values[header.index('Gmail ID')] != gmail:
+            invalidate(ALL_USERS_SHEET_ID)
+            return find_user(gmail)
+        if not _same_row(values, snapshot.values[row_id - 1]):
+            invalidate(ALL_USERS_SHEET_ID)
+        df = values_to_frame([header, values])
+        df['Row ID'] = row_id
+        return typed_frame(ALL_USERS_SHEET_ID, df).iloc[0]
+    except Exception as e:
+        st.error(f"Failed to look up user {gmail}: {e}")
+        return None
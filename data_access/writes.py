@@ -0,0 +1,63 @@
+"""Row-level writes that diff against the cached snapshot instead of rewriting sheets."""
+import pandas as pd
+import streamlit as st
+
+from data_access.backends import get_backend
+from data_access.batch import WriteBatch
+from data_access.store import get_cache, invalidate
+
+
+def _cell(value):
+    if value is None or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return ""
+    return str(value)
+
+
+def upsert_rows(sheet_id, rows, key):
+    """Writes `rows` (dicts keyed by column name) into the sheet, matching on `key`.
+
+    Rows whose key already exists are compared with a freshly synced snapshot
+    and only their changed cells are written, all in one batch_update. New keys
+    are appended in a single append_rows call and unknown columns are added to
+    the header. Returns True on success.
+    """
+    try:
+        backend = get_backend()
+        # Cells are written by row number, so diff against the sheet as it is
+        # now: a served snapshot can be minutes old and its rows may have moved.
+        invalidate(sheet_id)
+        snapshot = get_cache().get(sheet_id)
+        values = snapshot.values if snapshot is not None else []
+        header = [str(h).strip() for h in values[0]] if values else []
+        columns = list(header)
+        for row in rows:
+            columns += [col for col in row if col not in columns]
+
+        if key in header:
+            key_col = header.index(key)
+            positions = {row_values[key_col]: n for n, row_values in enumerate(values[1:], start=2)}
+        else:
+            positions = {}
+
+        batch = WriteBatch(backend)
+        if len(columns) > len(header):
+            batch.update_range(sheet_id, 1, len(header) + 1, [columns[len(header):]])
+        appends = []
+        for row in rows:
+            row_num = positions.get(_cell(row.get(key)))
+            if row_num is None:
+                appends.append([_cell(row.get(col)) for col in columns])
+                continue
+            current = list(values[row_num - 1]) + [""] * (len(columns) - len(values[row_num - 1]))
+            for col, value in row.items():
+                col_num = columns.index(col) + 1
+                if current[col_num - 1] != _cell(value):
+                    batch.update_cell(sheet_id, row_num, col_num, _cell(value))
+        batch.flush()
+        if appends:
+            backend.append_rows(sheet_id, appends)
+        invalidate(sheet_id)
+        return True
+    except Exception as e:
+        st.error(f"Failed to save data: {e}")
+        return False
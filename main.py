@@ -1,82 +1,25 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-import gspread
-import json
-import base64
+from datetime import datetime
 import hashlib
 
-from google.oauth2.service_account import Credentials
+from data_access import (
+    ALL_USERS_SHEET_ID, SUBSCRIPTION_PLANS, WriteBatch, fetch_user, find_user, finish_rerun, load_data,
+    start_rerun, upsert_rows,
+)
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="PRK Home Tuition - Login")
-DATE_FORMAT = "%d-%m-%Y"
-SUBSCRIPTION_PLANS = {
-    "₹1000 for 6 months (With Advance Classes)": 182,
-    "₹2000 for 1 year (With Advance Classes)": 365,
-    "₹200 for 30 days (Subjects Homework Only)": 30
-}
 UPI_ID = "9685840429@pnb"
 SECURITY_QUESTIONS = ["What is your mother's maiden name?", "What was the name of your first pet?", "What city were you born in?"]
 
 # === UTILITY FUNCTIONS ===
-@st.cache_resource
-def connect_to_gsheets():
-    try:
-        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        decoded_creds = base64.b64decode(st.secrets["google_service"]["base64_credentials"])
-        credentials_dict = json.loads(decoded_creds)
-        credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
-        client = gspread.authorize(credentials)
-        return client
-    except Exception as e:
-        st.error(f"Error connecting to Google APIs: {e}")
-        return None
-
-@st.cache_data(ttl=30)
-def load_data(sheet_id):
-    try:
-        client = connect_to_gsheets()
-        if client is None: return pd.DataFrame()
-        sheet = client.open_by_key(sheet_id).sheet1
-        all_values = sheet.get_all_values()
-        if not all_values: return pd.DataFrame()
-        return pd.DataFrame(all_values[1:], columns=all_values[0])
-    except Exception as e:
-        st.error(f"Failed to load data for sheet ID {sheet_id}: {e}")
-        return pd.DataFrame()
-
-def save_data(df, sheet_id):
-    try:
-        client = connect_to_gsheets()
-        sheet = client.open_by_key(sheet_id).sheet1
-        df_to_save = df.drop(columns=['Row ID'], errors='ignore')
-        df_str = df_to_save.fillna("").astype(str)
-        sheet.clear()
-        sheet.update([df_str.columns.values.tolist()] + df_str.values.tolist())
-        load_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"Failed to save data: {e}")
-        return False
-
-def find_user(gmail):
-    df_users = load_data(ALL_USERS_SHEET_ID)
-    if not df_users.empty and 'Gmail ID' in df_users.columns:
-        user_data = df_users[df_users['Gmail ID'] == gmail]
-        if not user_data.empty:
-            return user_data.iloc[0]
-    return None
-
 def make_hashes(password):
     return hashlib.sha256(str.encode(password)).hexdigest()
 
 def check_hashes(password, hashed_text):
     return make_hashes(password) == hashed_text if hashed_text else False
 
-# === SHEET IDs ===
-ALL_USERS_SHEET_ID = "18r78yFIjWr-gol6rQLeKuDPld9Rc1uDN8IQRffw68YA"
-
 # === SESSION STATE ===
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
@@ -85,6 +28,9 @@ if "logged_in" not in st.session_state:
     st.session_state.user_gmail = ""
     st.session_state.page_state = "login"
 
+# === METRICS ===
+start_rerun("Login")
+
 # === MAIN APP ROUTER ===
 
 if st.session_state.logged_in:
@@ -129,13 +75,15 @@ else:
             login_gmail = st.text_input("Username (Your Gmail ID)").lower().strip()
             login_pwd = st.text_input("PIN (Your Password)", type="password")
             if st.form_submit_button("Login", use_container_width=True):
-                load_data.clear()
-                user_data = find_user(login_gmail)
+                user_data = fetch_user(login_gmail)
                 if user_data is not None and check_hashes(login_pwd, user_data.get("Password")):
                     role = user_data.get("Role", "").lower()
                     can_login = False
                     if role == "student":
-                        if user_data.get("Payment Confirmed") == "Yes" and datetime.today().date() <= pd.to_datetime(user_data.get("Subscribed Till")).date():
+                        subscribed_till = user_data.get("Subscribed Till_dt")
+                        if user_data.get("Payment Confirmed") == "Yes" and pd.isna(subscribed_till) and str(user_data.get("Subscribed Till", "")).strip():
+                            st.error("Your subscription date could not be read. Please contact the admin.")
+                        elif user_data.get("Payment Confirmed") == "Yes" and pd.notna(subscribed_till) and datetime.today().date() <= subscribed_till.date():
                             can_login = True
                         else:
                             st.error("Subscription expired or not confirmed.")
@@ -178,8 +126,7 @@ else:
                     elif not all([name, father_name, gmail, mobile_number, cls, pwd, plan, security_q, security_a, parent_phonepe]):
                         st.warning("Please fill in ALL details.")
                     else:
-                        df = load_data(ALL_USERS_SHEET_ID)
-                        if not df.empty and gmail in df["Gmail ID"].values:
+                        if find_user(gmail) is not None:
                             st.error("This Gmail is already registered.")
                         else:
                             new_row_data = {
@@ -190,9 +137,7 @@ else:
                                 "Payment Confirmed": "No", "Subscription Date": "", 
                                 "Subscribed Till": "", "Parent PhonePe": parent_phonepe
                             }
-                            df_new = pd.DataFrame([new_row_data])
-                            df = pd.concat([df, df_new], ignore_index=True)
-                            if save_data(df, ALL_USERS_SHEET_ID):
+                            if upsert_rows(ALL_USERS_SHEET_ID, [new_row_data], key="Gmail ID"):
                                 st.success("Registration successful! Please follow payment instructions.")
 
             if plan:
@@ -221,8 +166,7 @@ else:
                     elif not all([name, gmail, mobile_number, pwd, security_q, security_a]):
                         st.warning("Please fill in all details.")
                     else:
-                        df = load_data(ALL_USERS_SHEET_ID)
-                        if not df.empty and gmail in df["Gmail ID"].values:
+                        if find_user(gmail) is not None:
                             st.error("This Gmail is already registered.")
                         else:
                             new_row = {
@@ -231,9 +175,7 @@ else:
                                 "Security Question": security_q, "Security Answer": security_a, 
                                 "Role": "Teacher", "Confirmed": "No"
                             }
-                            df_new = pd.DataFrame([new_row])
-                            df = pd.concat([df, df_new], ignore_index=True)
-                            if save_data(df, ALL_USERS_SHEET_ID):
+                            if upsert_rows(ALL_USERS_SHEET_ID, [new_row], key="Gmail ID"):
                                 st.success("Teacher registered! Please wait for admin confirmation.")
                                 
 
@@ -260,15 +202,18 @@ else:
                 elif security_answer != user_data.get("Security Answer"):
                     st.error("Incorrect security answer.")
                 else:
-                    client = connect_to_gsheets()
-                    sheet = client.open_by_key(ALL_USERS_SHEET_ID).sheet1
-                    cell = sheet.find(gmail_to_reset)
-                    if cell:
-                        header_row = sheet.row_values(1)
-                        password_col = header_row.index("Password") + 1
-                        sheet.update_cell(cell.row, password_col, make_hashes(new_password))
-                        load_data.clear()
+                    # The cached row may have moved since the snapshot; confirm it holds this user before writing
+                    user_data = fetch_user(gmail_to_reset)
+                    if user_data is None or user_data.get('Gmail ID') != gmail_to_reset:
+                        st.error("Could not confirm your account right now. Please try again.")
+                    else:
+                        user_row = int(user_data.get('Row ID'))
+                        password_col = load_data(ALL_USERS_SHEET_ID).columns.get_loc("Password") + 1
+                        with WriteBatch() as batch:
+                            batch.update_cell(ALL_USERS_SHEET_ID, user_row, password_col, make_hashes(new_password))
                         st.success("Password updated! Please log in.")
     
     st.sidebar.markdown("---")
     st.sidebar.markdown("<div style='text-align: center;'>© 2025 PRK Home Tuition.<br>All Rights Reserved.</div>", unsafe_allow_html=True)
+
+finish_rerun()
@@ -1,62 +1,28 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import gspread
-import json
-import base64
 import plotly.express as px
 
-from google.oauth2.service_account import Credentials
+from data_access import (
+    ALL_USERS_SHEET_ID, ANNOUNCEMENTS_SHEET_ID, ANSWER_BANK_SHEET_ID, BANK_MARKS, DATE_FORMAT,
+    HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID, WriteBatch, answer_id, find_user, finish_rerun, grade_answers,
+    load_data, load_many, paginate, salary_totals, start_rerun, top_students, with_salary_points,
+)
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="Teacher Dashboard")
-DATE_FORMAT = "%d-%m-%Y"
 GRADE_MAP = {"Needs Improvement": 1, "Average": 2, "Good": 3, "Very Good": 4, "Outstanding": 5}
 GRADE_MAP_REVERSE = {v: k for k, v in GRADE_MAP.items()}
 
-# === UTILITY FUNCTIONS ===
-@st.cache_resource
-def connect_to_gsheets():
-    try:
-        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        decoded_creds = base64.b64decode(st.secrets["google_service"]["base64_credentials"])
-        credentials_dict = json.loads(decoded_creds)
-        credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
-        client = gspread.authorize(credentials)
-        return client
-    except Exception as e:
-        st.error(f"Error connecting to Google APIs: {e}")
-        return None
-
-@st.cache_data(ttl=60)
-def load_data(sheet_id):
-    try:
-        client = connect_to_gsheets()
-        if client is None: return pd.DataFrame()
-        sheet = client.open_by_key(sheet_id).sheet1
-        all_values = sheet.get_all_values()
-        if not all_values: return pd.DataFrame()
-        df = pd.DataFrame(all_values[1:], columns=all_values[0])
-        df.columns = df.columns.str.strip()
-        df['Row ID'] = range(2, len(df) + 2)
-        return df
-    except Exception as e:
-        st.error(f"Failed to load data for sheet ID {sheet_id}: {e}")
-        return pd.DataFrame()
-
-# === SHEET IDs ===
-ALL_USERS_SHEET_ID = "18r78yFIjWr-gol6rQLeKuDPld9Rc1uDN8IQRffw68YA"
-HOMEWORK_QUESTIONS_SHEET_ID = "1fU_oJWR8GbOCX_0TRu2qiXIwQ19pYy__ezXPsRH61qI"
-MASTER_ANSWER_SHEET_ID = "1lW2Eattf9kyhllV_NzMMq9tznibkhNJ4Ma-wLV5rpW0"
-ANSWER_BANK_SHEET_ID = "12S2YwNPHZIVtWSqXaRHIBakbFqoBVB4xcAcFfpwN3uw"
-ANNOUNCEMENTS_SHEET_ID = "1zEAhoWC9_3UK09H4cFk6lRd6i5ChF3EknVc76L7zquQ"
-
 # === SECURITY GATEKEEPER ===
 if not st.session_state.get("logged_in") or st.session_state.get("user_role") != "teacher":
     st.error("You must be logged in as a Teacher to access this page.")
     st.page_link("main.py", label="Go to Login Page")
     st.stop()
 
+# === METRICS ===
+start_rerun("Teacher Dashboard")
+
 # === SIDEBAR LOGOUT & COPYRIGHT ===
 st.sidebar.success(f"Welcome, {st.session_state.user_name}")
 if st.sidebar.button("Logout"):
@@ -68,6 +34,9 @@ st.sidebar.markdown("<div style='text-align: center;'>© 2025 PRK Home Tuition.<
 # === TEACHER DASHBOARD UI ===
 st.header(f"🧑‍🏫 Teacher Dashboard: Welcome {st.session_state.user_name}")
 
+# Fetch every sheet this page reads in parallel; the load_data calls below then hit the cache.
+load_many([ANNOUNCEMENTS_SHEET_ID, ALL_USERS_SHEET_ID, HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID, ANSWER_BANK_SHEET_ID])
+
 # --- Display Public Announcement (Updated) ---
 try:
     announcements_df = load_data(ANNOUNCEMENTS_SHEET_ID)
@@ -88,11 +57,9 @@ except Exception:
     
 # --- INSTRUCTION, ANNOUNCEMENT & SALARY NOTIFICATION ---
 df_users = load_data(ALL_USERS_SHEET_ID)
-teacher_info_row = df_users[df_users['Gmail ID'] == st.session_state.user_gmail]
-if not teacher_info_row.empty:
-    teacher_info = teacher_info_row.iloc[0]
-    points_str = str(teacher_info.get('Salary Points', '0')).strip()
-    salary_points = int(points_str) if points_str.isdigit() else 0
+teacher_info = find_user(st.session_state.user_gmail)
+if teacher_info is not None:
+    salary_points = int(salary_totals().get(st.session_state.user_gmail, 0))
 
     if salary_points >= 5000:
         st.success("🎉 Congratulations! You have earned 5000+ points. Please contact administration to register your salary account.")
@@ -110,11 +77,10 @@ if not teacher_info_row.empty:
                     row_id = int(teacher_info.get('Row ID'))
                     reply_col = df_users.columns.get_loc('Instruction_Reply') + 1
                     status_col = df_users.columns.get_loc('Instruction_Status') + 1
-                    sheet = client.open_by_key(ALL_USERS_SHEET_ID).sheet1
-                    sheet.update_cell(row_id, reply_col, reply_text)
-                    sheet.update_cell(row_id, status_col, "Replied")
+                    with WriteBatch() as batch:
+                        batch.update_cell(ALL_USERS_SHEET_ID, row_id, reply_col, reply_text)
+                        batch.update_cell(ALL_USERS_SHEET_ID, row_id, status_col, "Replied")
                     st.success("Your reply has been sent.")
-                    load_data.clear()
                     st.rerun()
                 else:
                     st.warning("Reply cannot be empty.")
@@ -134,7 +100,7 @@ if todays_homework.empty:
     st.info("You have not created any homework assignments today.")
 else:
     if 'selected_assignment' not in st.session_state:
-        summary_table = pd.pivot_table(todays_homework, index='Class', columns='Subject', aggfunc='size', fill_value=0)
+        summary_table = pd.pivot_table(todays_homework, index='Class', columns='Subject', aggfunc='size', fill_value=0, observed=True)
         st.markdown("#### Summary Table")
         st.dataframe(summary_table)
         st.markdown("---")
@@ -171,7 +137,7 @@ st.markdown("---")
 # --- NEW TAB SYSTEM USING st.radio ---
 selected_tab = st.radio(
     "Navigation",
-    ["Create Homework", "Grade Answers", "My Reports"],
+    ["Create Homework", "Grade Answers", "Bulk Grading", "My Reports"],
     horizontal=True,
     label_visibility="collapsed"
 )
@@ -202,11 +168,10 @@ if selected_tab == "Create Homework":
             for i, q in enumerate(st.session_state.questions_list):
                 st.write(f"{i + 1}. {q}")
             if st.button("Final Submit Homework"):
-                client = connect_to_gsheets()
-                sheet = client.open_by_key(HOMEWORK_QUESTIONS_SHEET_ID).sheet1
                 rows_to_add = [[ctx['class'], ctx['date'].strftime(DATE_FORMAT), st.session_state.user_name, ctx['subject'], q] for q in st.session_state.questions_list]
-                sheet.append_rows(rows_to_add, value_input_option='USER_ENTERED')
-                load_data.clear()
+                with WriteBatch() as batch:
+                    for row in rows_to_add:
+                        batch.append_row(HOMEWORK_QUESTIONS_SHEET_ID, row)
                 st.success("Homework submitted successfully!")
                 del st.session_state.context_set, st.session_state.homework_context, st.session_state.questions_list
                 st.rerun()
@@ -215,14 +180,14 @@ if selected_tab == "Create Homework":
             st.rerun()
     st.markdown("---")
 
-elif selected_tab == "Grade Answers":
-    st.subheader("Grade Student Answers")
-    
+elif selected_tab in ("Grade Answers", "Bulk Grading"):
     my_questions = df_homework[df_homework.get('Uploaded By') == st.session_state.user_name]['Question'].tolist()
-    answers_to_my_questions = df_live_answers[df_live_answers['Question'].isin(my_questions)].copy()
-    answers_to_my_questions['Marks'] = pd.to_numeric(answers_to_my_questions.get('Marks'), errors='coerce')
+    answers_to_my_questions = df_live_answers[df_live_answers['Question'].isin(my_questions)]
     ungraded = answers_to_my_questions[answers_to_my_questions['Marks'].isna()]
 
+if selected_tab == "Grade Answers":
+    st.subheader("Grade Student Answers")
+
     if ungraded.empty:
         st.success("🎉 All answers for your questions have been graded!")
     else:
@@ -248,7 +213,10 @@ elif selected_tab == "Grade Answers":
                 student_answers_df = ungraded[ungraded['Student Gmail'] == selected_gmail]
                 st.markdown(f"#### Grading answers for: **{real_user_name}**")
                 
-                for index, row in student_answers_df.sort_values(by='Date', ascending=False).iterrows():
+                page = paginate(
+                    student_answers_df, f"grading_{selected_gmail}", by=['Date_dt', 'Question'], ascending=[False, True],
+                )
+                for index, row in page.iterrows():
                     st.write(f"**Question:** {row.get('Question')}")
                     st.info(f"**Answer:** {row.get('Answer')}")
                     
@@ -266,61 +234,99 @@ elif selected_tab == "Grade Answers":
                             elif grade in ["Needs Improvement", "Average", "Good"] and not remarks.strip():
                                 st.warning("Remarks are required for this grade.")
                             else:
-                                with st.spinner("Saving..."):
-                                    client = connect_to_gsheets()
-                                    row_id_to_update = int(row.get('Row ID'))
-                                    
-                                    if grade in ["Very Good", "Outstanding"]:
-                                        live_sheet = client.open_by_key(MASTER_ANSWER_SHEET_ID).sheet1
-                                        answer_bank_sheet = client.open_by_key(ANSWER_BANK_SHEET_ID).sheet1
-                                        
-                                        row_to_move = df_live_answers.loc[index].copy()
-                                        row_to_move['Marks'] = GRADE_MAP[grade]
-                                        row_to_move['Remarks'] = remarks
-                                        
-                                        row_values_to_append = row_to_move.drop('Row ID').tolist()
-                                        
-                                        answer_bank_sheet.append_row(row_values_to_append, value_input_option='USER_ENTERED')
-                                        live_sheet.delete_rows(row_id_to_update)
+                                try:
+                                    with st.spinner("Saving..."):
+                                        # Moves to the bank are found by answer, not row number, and are safe to
+                                        # repeat; the salary point is a ledger row written by the same call.
+                                        saved = grade_answers(
+                                            {answer_id(row): (GRADE_MAP[grade], remarks)},
+                                            teacher_gmail=st.session_state.user_gmail if teacher_info is not None else None,
+                                        )
+                                except Exception as e:
+                                    st.error(f"Failed to save the grade: {e}. Saving it again is safe.")
+                                else:
+                                    if not saved:
+                                        st.warning("This answer has already been graded.")
+                                    elif grade in ["Very Good", "Outstanding"]:
                                         st.success("Grade saved and moved to Answer Bank!")
-                                        # --- FIX: Safely handle Salary Points increment ---
-                                        teacher_info_row = df_users[df_users['Gmail ID'] == st.session_state.user_gmail]
-                                        if not teacher_info_row.empty:
-                                            teacher_row_id = int(teacher_info_row.iloc[0].get('Row ID'))
-                
-                                            # Safely get the current points, defaulting to 0 if empty or not a number
-                                            points_str = str(teacher_info_row.iloc[0].get('Salary Points', '0')).strip()
-                                            current_points = int(points_str) if points_str.isdigit() else 0
-                
-                                            new_points = current_points + 1
-                                            points_col = list(df_users.columns).index("Salary Points") + 1
-                                            user_sheet = client.open_by_key(ALL_USERS_SHEET_ID).sheet1
-                                            user_sheet.update_cell(teacher_row_id, points_col, new_points)
-            
-                                            load_data.clear()
-                                            st.success("Saved!")
-                                            st.rerun()
                                     else:
-                                        live_sheet = client.open_by_key(MASTER_ANSWER_SHEET_ID).sheet1
-                                        marks_col = list(df_live_answers.columns).index("Marks") + 1
-                                        remarks_col = list(df_live_answers.columns).index("Remarks") + 1
-                                        live_sheet.update_cell(row_id_to_update, marks_col, GRADE_MAP[grade])
-                                        live_sheet.update_cell(row_id_to_update, remarks_col, remarks)
                                         st.success("Grade and remarks saved!")
-                                    
-                                    teacher_info_row = df_users[df_users['Gmail ID'] == st.session_state.user_gmail]
-                                    if not teacher_info_row.empty:
-                                        teacher_row_id = int(teacher_info_row.iloc[0].get('Row ID'))
-                                        current_points = int(teacher_info_row.iloc[0].get('Salary Points', 0))
-                                        new_points = current_points + 1
-                                        points_col = list(df_users.columns).index("Salary Points") + 1
-                                        user_sheet = client.open_by_key(ALL_USERS_SHEET_ID).sheet1
-                                        user_sheet.update_cell(teacher_row_id, points_col, new_points)
-                                    
-                                    load_data.clear()
                                     st.rerun()
                     st.markdown("---")
 
+elif selected_tab == "Bulk Grading":
+    st.subheader("Grade Many Answers at Once")
+    st.caption(
+        "Pick a grade (and remarks where needed) for as many answers as you like, then save them all together. "
+        "Answers left without a grade stay in your queue."
+    )
+
+    # The grid works on a copy of the queue taken when it was opened, so answers arriving
+    # meanwhile cannot shift the rows being edited. "Reload answers" takes a fresh copy.
+    class_options = ["All Classes"] + sorted(ungraded['Class'].dropna().unique().tolist())
+    bulk_class = st.selectbox("Class", class_options, key="bulk_class")
+    reload_queue = st.button("Reload answers")
+    if reload_queue or st.session_state.get("bulk_queue_class") != bulk_class:
+        queue = ungraded if bulk_class == "All Classes" else ungraded[ungraded['Class'] == bulk_class]
+        student_names = df_users.drop_duplicates(subset='Gmail ID').set_index('Gmail ID')['User Name']
+        st.session_state.bulk_queue = pd.DataFrame({
+            'Student Gmail': queue['Student Gmail'],
+            'Student': queue['Student Gmail'].map(student_names).fillna(queue['Student Gmail']),
+            'Class': queue['Class'].astype(str), 'Date': queue['Date'], 'Subject': queue['Subject'].astype(str),
+            'Question': queue['Question'], 'Answer': queue['Answer'], 'Grade': None, 'Remarks': "",
+            'Date_dt': queue['Date_dt'],
+        }).sort_values(by=['Date_dt', 'Student']).drop(columns='Date_dt')
+        st.session_state.bulk_queue_class = bulk_class
+        st.session_state.bulk_grid_version = st.session_state.get("bulk_grid_version", 0) + 1
+    queue = st.session_state.bulk_queue
+
+    if queue.empty:
+        st.success("🎉 All answers for your questions have been graded!")
+    else:
+        with st.form("bulk_grading_form"):
+            edited = st.data_editor(
+                queue,
+                key=f"bulk_grid_{st.session_state.bulk_grid_version}",
+                hide_index=True,
+                use_container_width=True,
+                column_order=['Student', 'Class', 'Date', 'Subject', 'Question', 'Answer', 'Grade', 'Remarks'],
+                disabled=['Student', 'Class', 'Date', 'Subject', 'Question', 'Answer'],
+                column_config={
+                    'Grade': st.column_config.SelectboxColumn("Grade", options=list(GRADE_MAP)),
+                    'Remarks': st.column_config.TextColumn("Remarks", help="Required for Needs Improvement, Average and Good"),
+                    'Answer': st.column_config.TextColumn("Answer", width="large"),
+                },
+            )
+            submitted = st.form_submit_button("Save All Grades")
+
+        if submitted:
+            graded = edited[edited['Grade'].notna()]
+            graded_remarks = graded['Remarks'].fillna("").astype(str).str.strip()
+            missing_remarks = graded[graded['Grade'].isin(["Needs Improvement", "Average", "Good"]) & (graded_remarks == "")]
+            if graded.empty:
+                st.warning("Please select a grade for at least one answer.")
+            elif not missing_remarks.empty:
+                st.warning(f"Remarks are required for {len(missing_remarks)} answer(s) graded Needs Improvement, Average or Good.")
+            else:
+                grades = {
+                    answer_id(row): (GRADE_MAP[row['Grade']], str(row['Remarks'] or "").strip())
+                    for _, row in graded.iterrows()
+                }
+                # Answers are found again by student, question and date, so rows shifted by other
+                # graders' moves don't matter; ones graded by someone else meanwhile are skipped.
+                try:
+                    with st.spinner(f"Saving {len(grades)} grades..."):
+                        saved = grade_answers(
+                            grades, teacher_gmail=st.session_state.user_gmail if teacher_info is not None else None,
+                        )
+                except Exception as e:
+                    st.error(f"Failed to save the grades: {e}. Saving them again is safe.")
+                else:
+                    moved = sum(1 for aid in saved if grades[aid][0] in BANK_MARKS)
+                    del st.session_state.bulk_queue_class
+                    st.success(f"Saved {len(saved)} grades; {moved} moved to the Answer Bank.")
+                    st.rerun()
+
 elif selected_tab == "My Reports":
     st.subheader("My Reports")
     
@@ -336,15 +342,15 @@ elif selected_tab == "My Reports":
         with col2:
             end_date = st.date_input("End Date", datetime.today(), format="DD-MM-YYYY")
         
-        teacher_homework['Date_dt'] = pd.to_datetime(teacher_homework['Date'], format=DATE_FORMAT, errors='coerce').dt.date
+        homework_dates = teacher_homework['Date_dt'].dt.date
         filtered_report = teacher_homework[
-            (teacher_homework['Date_dt'] >= start_date) &
-            (teacher_homework['Date_dt'] <= end_date)
+            (homework_dates >= start_date) &
+            (homework_dates <= end_date)
         ]
         if filtered_report.empty:
             st.warning("No homework found in the selected date range.")
         else:
-            summary = filtered_report.groupby(['Class', 'Subject']).size().reset_index(name='Total Questions')
+            summary = filtered_report.groupby(['Class', 'Subject'], observed=True).size().reset_index(name='Total Questions')
             st.dataframe(summary)
             fig = px.bar(summary, x='Class', y='Total Questions', color='Subject', title='Your Homework Contributions')
             st.plotly_chart(fig, use_container_width=True)
@@ -353,9 +359,8 @@ elif selected_tab == "My Reports":
     
     # Report 2: Top Teachers Leaderboard
     st.subheader("🏆 Top Teachers Leaderboard")
-    df_all_teachers = df_users[df_users['Role'] == 'Teacher'].copy()
+    df_all_teachers = with_salary_points(df_users[df_users['Role'] == 'Teacher'])
     if 'Salary Points' in df_all_teachers.columns:
-        df_all_teachers['Salary Points'] = pd.to_numeric(df_all_teachers.get('Salary Points', 0), errors='coerce').fillna(0)
         ranked_teachers = df_all_teachers.sort_values(by='Salary Points', ascending=False)
         ranked_teachers['Rank'] = range(1, len(ranked_teachers) + 1)
         
@@ -381,23 +386,13 @@ elif selected_tab == "My Reports":
 
     # Report 3: Top 3 Students (from Answer Bank)
     st.subheader("🥇 Class-wise Top 3 Students")
-    df_students_report = df_users[df_users['Role'] == 'Student']
-    if df_answer_bank.empty or df_students_report.empty:
+    if df_answer_bank.empty:
         st.info("Leaderboard will be generated once answers are graded and moved to the bank.")
     else:
-        df_answer_bank['Marks'] = pd.to_numeric(df_answer_bank.get('Marks'), errors='coerce')
-        graded_answers = df_answer_bank.dropna(subset=['Marks'])
-        if graded_answers.empty:
+        top_students_df = top_students(3)
+        if top_students_df.empty:
             st.info("The leaderboard is available after answers have been graded and moved to the bank.")
         else:
-            df_merged = pd.merge(graded_answers, df_students_report, left_on='Student Gmail', right_on='Gmail ID', suffixes=('_ans', '_user'))
-            leaderboard_df = df_merged.groupby(['Class_user', 'User Name'])['Marks'].mean().reset_index()
-            leaderboard_df.rename(columns={'Class_user': 'Class'}, inplace=True)
-            leaderboard_df['Rank'] = leaderboard_df.groupby('Class')['Marks'].rank(method='dense', ascending=False).astype(int)
-            leaderboard_df = leaderboard_df.sort_values(by=['Class', 'Rank'])
-            top_students_df = leaderboard_df.groupby('Class').head(3).reset_index(drop=True)
-            top_students_df['Marks'] = top_students_df['Marks'].round(2)
-            
             st.markdown("#### Top Performers Summary")
             st.dataframe(top_students_df[['Rank', 'User Name', 'Class', 'Marks']])
 
@@ -419,3 +414,5 @@ elif selected_tab == "My Reports":
 
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>© 2025 PRK Home Tuition. All Rights Reserved.</p>", unsafe_allow_html=True)
+
+finish_rerun()
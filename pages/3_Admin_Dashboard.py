@@ -2,51 +2,16 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import gspread
-import json
-import base64
 
-from google.oauth2.service_account import Credentials
+from data_access import (
+    ALL_USERS_SHEET_ID, ANNOUNCEMENTS_SHEET_ID, DATE_FORMAT, SUBSCRIPTION_PLANS, finish_rerun, load_data, load_many,
+    start_rerun, upsert_rows,
+)
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="Admin Dashboard")
-DATE_FORMAT = "%d-%m-%Y"
-SUBSCRIPTION_PLANS = {
-    "₹1000 for 6 months (Advance)": 182,
-    "₹2000 for 1 year (Advance)": 365,
-    "₹200 for 30 days (Normal)": 30
-}
-
-# === AUTHENTICATION & GOOGLE SHEETS SETUP ===
-try:
-    scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    decoded_creds = base64.b64decode(st.secrets["google_service"]["base64_credentials"])
-    credentials_dict = json.loads(decoded_creds)
-    credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
-    client = gspread.authorize(credentials)
-
-    ALL_USERS_SHEET = client.open_by_key("18r78yFIjWr-gol6rQLeKuDPld9Rc1uDN8IQRffw68YA").sheet1
-except Exception as e:
-    st.error(f"Error connecting to Google APIs or Sheets: {e}")
-    st.stop()
-
-# === UTILITY FUNCTIONS ===
-@st.cache_data(ttl=60)
-def load_data(_sheet):
-    all_values = _sheet.get_all_values()
-    if not all_values:
-        return pd.DataFrame()
-    df = pd.DataFrame(all_values[1:], columns=all_values[0])
-    df.columns = df.columns.str.strip()
-    df['Row ID'] = range(2, len(df) + 2)
-    return df
-
-def save_data(df, sheet):
-    df_to_save = df.drop(columns=['Row ID'], errors='ignore')
-    df_str = df_to_save.fillna("").astype(str)
-    sheet.clear()
-    sheet.update([df_str.columns.values.tolist()] + df_str.values.tolist())
-    load_data.clear()
+# Days confirmed for a registration whose plan is not in SUBSCRIPTION_PLANS.
+DEFAULT_PLAN_DAYS = 30
 
 # === SECURITY GATEKEEPER ===
 if not st.session_state.get("logged_in") or st.session_state.get("user_role") != "admin":
@@ -54,6 +19,9 @@ if not st.session_state.get("logged_in") or st.session_state.get("user_role") !=
     st.page_link("main.py", label="Go to Login Page")
     st.stop()
 
+# === METRICS ===
+start_rerun("Admin Dashboard")
+
 # === SIDEBAR LOGOUT ===
 st.sidebar.success(f"Welcome, {st.session_state.user_name}")
 if st.sidebar.button("Logout"):
@@ -62,6 +30,10 @@ if st.sidebar.button("Logout"):
 
 # === ADMIN DASHBOARD UI ===
 st.header("👑 Admin Panel")
+st.page_link("pages/5_Operations.py", label="Operations: API calls, cache and reruns", icon="🛠️")
+
+# Fetch every sheet this page reads in parallel; the load_data calls below then hit the cache.
+load_many([ANNOUNCEMENTS_SHEET_ID, ALL_USERS_SHEET_ID])
 
 # --- Display Public Announcement (Updated) ---
 try:
@@ -82,7 +54,7 @@ except Exception:
 
 
 # Load all user data
-df_users = load_data(ALL_USERS_SHEET)
+df_users = load_data(ALL_USERS_SHEET_ID)
 
 # Display user counts
 total_students = len(df_users[df_users['Role'] == 'Student'])
@@ -105,22 +77,60 @@ with tab1:
     if unconfirmed_students.empty:
         st.info("No pending student payments.")
     else:
-        for index, row in unconfirmed_students.iterrows():
-            st.write(f"**Name:** {row.get('User Name')} | **Plan:** {row.get('Subscription Plan')}")
-            if st.button(f"✅ Confirm Payment for {row.get('User Name')}", key=f"confirm_student_{row.get('Gmail ID')}"):
-                plan_days = SUBSCRIPTION_PLANS.get(row.get("Subscription Plan"), 30)
-                today = datetime.today()
-                till_date = (today + timedelta(days=plan_days)).strftime(DATE_FORMAT)
-                
-                # Find the original index from the main user dataframe to update
-                original_index = df_users[df_users['Gmail ID'] == row.get('Gmail ID')].index[0]
-                df_users.loc[original_index, "Subscription Date"] = today.strftime(DATE_FORMAT)
-                df_users.loc[original_index, "Subscribed Till"] = till_date
-                df_users.loc[original_index, "Payment Confirmed"] = "Yes"
-                
-                save_data(df_users, ALL_USERS_SHEET)
-                st.success(f"Payment confirmed for {row.get('User Name')}.")
-                st.rerun()
+        # References from the bank or UPI statement; listed students are ticked for confirmation.
+        uploaded = st.file_uploader(
+            "Import payment references (CSV with 'Gmail ID' and 'Payment Reference' columns)", type="csv",
+        )
+        references = {}
+        if uploaded is not None:
+            imported = pd.read_csv(uploaded, dtype=str).fillna("")
+            imported.columns = imported.columns.str.strip()
+            if not {'Gmail ID', 'Payment Reference'} <= set(imported.columns):
+                st.error("The CSV needs a 'Gmail ID' and a 'Payment Reference' column.")
+            else:
+                references = dict(zip(imported['Gmail ID'].str.strip(), imported['Payment Reference'].str.strip()))
+                unmatched = sorted(set(references) - set(unconfirmed_students['Gmail ID']))
+                if unmatched:
+                    st.warning(
+                        f"{len(unmatched)} Gmail ID(s) in the file have no pending payment: {', '.join(unmatched[:10])}"
+                    )
+
+        select_all_students = st.checkbox("Select all pending students")
+        saved_references = unconfirmed_students['Payment Reference'] if 'Payment Reference' in df_users.columns else ""
+        pending_payments = pd.DataFrame({
+            'Confirm': select_all_students or unconfirmed_students['Gmail ID'].isin(references),
+            'User Name': unconfirmed_students['User Name'],
+            'Gmail ID': unconfirmed_students['Gmail ID'],
+            'Class': unconfirmed_students['Class'].astype(str),
+            'Subscription Plan': unconfirmed_students['Subscription Plan'],
+            'Payment Reference': unconfirmed_students['Gmail ID'].map(references).fillna(saved_references),
+        })
+        with st.form("confirm_payments_form"):
+            edited_payments = st.data_editor(
+                pending_payments,
+                hide_index=True,
+                use_container_width=True,
+                disabled=['User Name', 'Gmail ID', 'Class', 'Subscription Plan'],
+                column_config={'Confirm': st.column_config.CheckboxColumn("Confirm")},
+            )
+            if st.form_submit_button("✅ Confirm Selected Payments"):
+                selected = edited_payments[edited_payments['Confirm']]
+                if selected.empty:
+                    st.warning("Please tick at least one student.")
+                else:
+                    today = datetime.today()
+                    plan_days = selected['Subscription Plan'].map(SUBSCRIPTION_PLANS).fillna(DEFAULT_PLAN_DAYS)
+                    confirmations = [{
+                        "Gmail ID": gmail,
+                        "Subscription Date": today.strftime(DATE_FORMAT),
+                        "Subscribed Till": (today + timedelta(days=int(days))).strftime(DATE_FORMAT),
+                        "Payment Confirmed": "Yes",
+                        "Payment Reference": reference,
+                    } for gmail, days, reference in zip(selected['Gmail ID'], plan_days, selected['Payment Reference'])]
+                    # Only the changed cells of the selected students are written, in one batch_update.
+                    if upsert_rows(ALL_USERS_SHEET_ID, confirmations, key="Gmail ID"):
+                        st.success(f"Payment confirmed for {len(selected)} student(s).")
+                        st.rerun()
 
     st.markdown("---")
     st.markdown("#### Confirmed Students")
@@ -136,16 +146,33 @@ with tab2:
     if unconfirmed_teachers.empty:
         st.info("No pending teacher confirmations.")
     else:
-        for index, row in unconfirmed_teachers.iterrows():
-            st.write(f"**Name:** {row.get('User Name')} | **Gmail:** {row.get('Gmail ID')}")
-            if st.button(f"✅ Confirm Teacher: {row.get('User Name')}", key=f"confirm_teacher_{row.get('Gmail ID')}"):
-                original_index = df_users[df_users['Gmail ID'] == row.get('Gmail ID')].index[0]
-                df_users.loc[original_index, "Confirmed"] = "Yes"
-                save_data(df_users, ALL_USERS_SHEET)
-                st.success(f"Teacher {row.get('User Name')} confirmed.")
-                st.rerun()
+        select_all_teachers = st.checkbox("Select all pending teachers")
+        pending_teachers = pd.DataFrame({
+            'Confirm': select_all_teachers,
+            'User Name': unconfirmed_teachers['User Name'],
+            'Gmail ID': unconfirmed_teachers['Gmail ID'],
+            'Role': unconfirmed_teachers['Role'].astype(str),
+        })
+        with st.form("confirm_teachers_form"):
+            edited_teachers = st.data_editor(
+                pending_teachers,
+                hide_index=True,
+                use_container_width=True,
+                disabled=['User Name', 'Gmail ID', 'Role'],
+                column_config={'Confirm': st.column_config.CheckboxColumn("Confirm")},
+            )
+            if st.form_submit_button("✅ Confirm Selected Teachers"):
+                selected = edited_teachers[edited_teachers['Confirm']]
+                confirmations = [{"Gmail ID": gmail, "Confirmed": "Yes"} for gmail in selected['Gmail ID']]
+                if selected.empty:
+                    st.warning("Please tick at least one teacher.")
+                elif upsert_rows(ALL_USERS_SHEET_ID, confirmations, key="Gmail ID"):
+                    st.success(f"{len(selected)} teacher(s) confirmed.")
+                    st.rerun()
 
     st.markdown("---")
     st.markdown("#### Confirmed Teachers")
     confirmed_teachers = df_teachers[df_teachers.get("Confirmed") == "Yes"]
     st.dataframe(confirmed_teachers)
+
+finish_rerun()
@@ -1,53 +1,16 @@
 import streamlit as st
 import pandas as pd
-import gspread
-import json
-import base64
 import plotly.express as px
 from datetime import datetime, timedelta
 
-from google.oauth2.service_account import Credentials
+from data_access import (
+    ALL_USERS_SHEET_ID, ANNOUNCEMENTS_SHEET_ID, ANSWER_BANK_SHEET_ID, DATE_FORMAT,
+    HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID, WriteBatch, finish_rerun, load_data, load_many, start_rerun,
+    teacher_activity, top_students, with_salary_points,
+)
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="Principal Dashboard")
-DATE_FORMAT = "%d-%m-%Y"
-
-# === UTILITY FUNCTIONS ===
-@st.cache_resource
-def connect_to_gsheets():
-    try:
-        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        decoded_creds = base64.b64decode(st.secrets["google_service"]["base64_credentials"])
-        credentials_dict = json.loads(decoded_creds)
-        credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
-        client = gspread.authorize(credentials)
-        return client
-    except Exception as e:
-        st.error(f"Error connecting to Google APIs: {e}")
-        return None
-
-@st.cache_data(ttl=60)
-def load_data(sheet_id):
-    try:
-        client = connect_to_gsheets()
-        if client is None: return pd.DataFrame()
-        sheet = client.open_by_key(sheet_id).sheet1
-        all_values = sheet.get_all_values()
-        if not all_values: return pd.DataFrame()
-        df = pd.DataFrame(all_values[1:], columns=all_values[0])
-        df.columns = df.columns.str.strip()
-        df['Row ID'] = range(2, len(df) + 2)
-        return df
-    except Exception as e:
-        st.error(f"Failed to load data for sheet ID {sheet_id}: {e}")
-        return pd.DataFrame()
-
-# === SHEET IDs ===
-ALL_USERS_SHEET_ID = "18r78yFIjWr-gol6rQLeKuDPld9Rc1uDN8IQRffw68YA"
-HOMEWORK_QUESTIONS_SHEET_ID = "1fU_oJWR8GbOCX_0TRu2qiXIwQ19pYy__ezXPsRH61qI"
-MASTER_ANSWER_SHEET_ID = "1lW2Eattf9kyhllV_NzMMq9tznibkhNJ4Ma-wLV5rpW0"
-ANNOUNCEMENTS_SHEET_ID = "1zEAhoWC9_3UK09H4cFk6lRd6i5ChF3EknVc76L7zquQ"
-ANSWER_BANK_SHEET_ID = "12S2YwNPHZIVtWSqXaRHIBakbFqoBVB4xcAcFfpwN3uw"
 
 # === SECURITY GATEKEEPER ===
 if not st.session_state.get("logged_in") or st.session_state.get("user_role") != "principal":
@@ -55,6 +18,9 @@ if not st.session_state.get("logged_in") or st.session_state.get("user_role") !=
     st.page_link("main.py", label="Go to Login Page")
     st.stop()
 
+# === METRICS ===
+start_rerun("Principal Dashboard")
+
 # === SIDEBAR LOGOUT & COPYRIGHT ===
 st.sidebar.success(f"Welcome, {st.session_state.user_name}")
 if st.sidebar.button("Logout"):
@@ -66,6 +32,9 @@ st.sidebar.markdown("<div style='text-align: center;'>© 2025 PRK Home Tuition.<
 # === PRINCIPAL DASHBOARD UI ===
 st.header("🏛️ Principal Dashboard")
 
+# Fetch every sheet this page reads in parallel; the load_data calls below then hit the cache.
+load_many([ANNOUNCEMENTS_SHEET_ID, ALL_USERS_SHEET_ID, HOMEWORK_QUESTIONS_SHEET_ID, MASTER_ANSWER_SHEET_ID, ANSWER_BANK_SHEET_ID])
+
 # --- Display Public Announcement (Updated) ---
 try:
     announcements_df = load_data(ANNOUNCEMENTS_SHEET_ID)
@@ -125,11 +94,9 @@ with instruction_tab:
                         if not user_row.empty:
                             row_id = int(user_row.iloc[0]['Row ID'])
                             instruction_col = df_users.columns.get_loc('Instructions') + 1
-                            client = connect_to_gsheets()
-                            sheet = client.open_by_key(ALL_USERS_SHEET_ID).sheet1
-                            sheet.update_cell(row_id, instruction_col, instruction_text)
+                            with WriteBatch() as batch:
+                                batch.update_cell(ALL_USERS_SHEET_ID, row_id, instruction_col, instruction_text)
                             st.success(f"Instruction sent to {real_user_name}.")
-                            load_data.clear()
                         else:
                             st.error("Selected user could not be found in the database.")
                     else:
@@ -140,15 +107,12 @@ with instruction_tab:
             announcement_text = st.text_area("Enter Public Announcement:")
             if st.form_submit_button("Broadcast Announcement"):
                 if announcement_text:
-                    client = connect_to_gsheets()
-                    announcement_sheet_obj = client.open_by_key(ANNOUNCEMENTS_SHEET_ID).sheet1
-                    
                     # Add today's date with the announcement
                     today_str = datetime.today().strftime(DATE_FORMAT)
-                    announcement_sheet_obj.insert_row([announcement_text, today_str], 2)
-                    
+                    # Newest first, right below the header.
+                    with WriteBatch() as batch:
+                        batch.insert_row(ANNOUNCEMENTS_SHEET_ID, [announcement_text, today_str], 2)
                     st.success("Public announcement sent to all dashboards!")
-                    load_data.clear()
                 else:
                     st.warning("Announcement text cannot be empty.")
 
@@ -157,33 +121,15 @@ with report_tab:
     st.markdown("#### 📅 Today's Teacher Activity")
     
     today_str = datetime.today().strftime(DATE_FORMAT)
-    df_teachers_report = df_users[df_users['Role'].isin(['Teacher', 'Admin', 'Principal'])].copy()
-    todays_homework = df_homework[df_homework['Date'] == today_str]
-    questions_created = todays_homework.groupby('Uploaded By').size().reset_index(name='Created Today')
-    teacher_activity = pd.merge(df_teachers_report[['User Name']], questions_created, left_on='User Name', right_on='Uploaded By', how='left')
-    teacher_activity.drop(columns=['Uploaded By'], inplace=True, errors='ignore')
-    
-    df_live_answers['Marks'] = pd.to_numeric(df_live_answers.get('Marks'), errors='coerce')
-    ungraded_answers = df_live_answers[df_live_answers['Marks'].isna()]
-    
-    pending_summary_list = []
-    for teacher_name in teacher_activity['User Name']:
-        teacher_questions = df_homework[df_homework['Uploaded By'] == teacher_name]['Question'].tolist()
-        pending_count = len(ungraded_answers[ungraded_answers['Question'].isin(teacher_questions)])
-        pending_summary_list.append({'User Name': teacher_name, 'Pending Answers': pending_count})
-        
-    pending_df = pd.DataFrame(pending_summary_list)
-    teacher_activity = pd.merge(teacher_activity, pending_df, on='User Name', how='left')
-    teacher_activity.fillna(0, inplace=True)
-    st.dataframe(teacher_activity)
+    todays_activity = teacher_activity(today_str)
+    st.dataframe(todays_activity)
     
     st.markdown("---")
     
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("#### 🏆 Top Teachers Leaderboard (All Time)")
-        df_teachers = df_users[df_users['Role'] == 'Teacher'].copy()
-        df_teachers['Salary Points'] = pd.to_numeric(df_teachers.get('Salary Points', 0), errors='coerce').fillna(0)
+        df_teachers = with_salary_points(df_users[df_users['Role'] == 'Teacher'])
         ranked_teachers = df_teachers.sort_values(by='Salary Points', ascending=False)
         ranked_teachers['Rank'] = range(1, len(ranked_teachers) + 1)
         st.dataframe(ranked_teachers[['User Name', 'Salary Points']])
@@ -194,12 +140,11 @@ with report_tab:
         st.markdown("#### 📉 Students Needing Improvement")
         df_students = df_users[df_users['Role'] == 'Student']
         if not df_answer_bank.empty:
-            df_answer_bank['Marks'] = pd.to_numeric(df_answer_bank.get('Marks'), errors='coerce')
             graded_answers = df_answer_bank.dropna(subset=['Marks'])
             if not graded_answers.empty:
                 student_performance = graded_answers.groupby('Student Gmail')['Marks'].mean().reset_index()
                 merged_df = pd.merge(student_performance, df_students, left_on='Student Gmail', right_on='Gmail ID')
-                weakest_students = merged_df.nsmallest(5, 'Marks').round(2)
+                weakest_students = merged_df.nsmallest(5, 'Marks').round({'Marks': 2})
                 st.dataframe(weakest_students[['User Name', 'Class', 'Marks']])
             else:
                 st.info("No graded answers in Answer Bank.")
@@ -210,23 +155,13 @@ with report_tab:
     
     # Top 3 Students (from Answer Bank)
     st.subheader("🥇 Class-wise Top 3 Students")
-    df_students_report = df_users[df_users['Role'] == 'Student']
-    if df_answer_bank.empty or df_students_report.empty:
+    if df_answer_bank.empty:
         st.info("Leaderboard will be generated once answers are graded and moved to the bank.")
     else:
-        df_answer_bank['Marks'] = pd.to_numeric(df_answer_bank.get('Marks'), errors='coerce')
-        graded_answers = df_answer_bank.dropna(subset=['Marks'])
-        if graded_answers.empty:
+        top_students_df = top_students(3)
+        if top_students_df.empty:
             st.info("The leaderboard is available after answers have been graded and moved to the bank.")
         else:
-            df_merged = pd.merge(graded_answers, df_students_report, left_on='Student Gmail', right_on='Gmail ID', suffixes=('_ans', '_user'))
-            leaderboard_df = df_merged.groupby(['Class_user', 'User Name'])['Marks'].mean().reset_index()
-            leaderboard_df.rename(columns={'Class_user': 'Class'}, inplace=True)
-            leaderboard_df['Rank'] = leaderboard_df.groupby('Class')['Marks'].rank(method='dense', ascending=False).astype(int)
-            leaderboard_df = leaderboard_df.sort_values(by=['Class', 'Rank'])
-            top_students_df = leaderboard_df.groupby('Class').head(3).reset_index(drop=True)
-            top_students_df['Marks'] = top_students_df['Marks'].round(2)
-            
             st.markdown("#### Top Performers Summary")
             st.dataframe(top_students_df[['Rank', 'User Name', 'Class', 'Marks']])
 
@@ -273,9 +208,8 @@ with individual_tab:
                 real_name = selected_display_name.split(' (')[0]
                 student_gmail = df_students[df_students['User Name'] == real_name].iloc[0]['Gmail ID']
                 
-                student_answers = df_answer_bank[df_answer_bank['Student Gmail'] == student_gmail].copy()
+                student_answers = df_answer_bank[df_answer_bank['Student Gmail'] == student_gmail]
                 if not student_answers.empty:
-                    student_answers['Marks'] = pd.to_numeric(student_answers['Marks'], errors='coerce')
                     graded_answers = student_answers.dropna(subset=['Marks'])
                     if not graded_answers.empty:
                         fig = px.bar(graded_answers, x='Subject', y='Marks', color='Subject', title=f"Subject-wise Performance for {selected_display_name}")
@@ -300,7 +234,7 @@ with individual_tab:
             if teacher_name != "---Select---":
                 teacher_homework = df_homework[df_homework['Uploaded By'] == teacher_name]
                 if not teacher_homework.empty:
-                    questions_by_subject = teacher_homework.groupby('Subject').size().reset_index(name='Question Count')
+                    questions_by_subject = teacher_homework.groupby('Subject', observed=True).size().reset_index(name='Question Count')
                     fig = px.bar(questions_by_subject, x='Subject', y='Question Count', color='Subject', title=f"Homework Created by {teacher_name}")
                     st.plotly_chart(fig, use_container_width=True)
                 else:
@@ -309,3 +243,5 @@ with individual_tab:
 
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>© 2025 PRK Home Tuition. All Rights Reserved.</p>", unsafe_allow_html=True)
+
+finish_rerun()
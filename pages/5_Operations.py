@@ -0,0 +1,181 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import time
+
+from data_access import (
+    ALL_USERS_SHEET_ID,
+    SHEET_NAMES,
+    finish_rerun,
+    get_backend,
+    get_metrics,
+    get_profiler,
+    load_data,
+    refresh_stats,
+    start_rerun,
+)
+
+# === CONFIGURATION ===
+st.set_page_config(layout="wide", page_title="Operations")
+TIME_WINDOWS = {"Last 15 minutes": 15, "Last hour": 60, "Last 24 hours": 24 * 60}
+
+# === SECURITY GATEKEEPER ===
+if not st.session_state.get("logged_in") or st.session_state.get("user_role") != "admin":
+    st.error("You must be logged in as an Admin to view this page.")
+    st.page_link("main.py", label="Go to Login Page")
+    st.stop()
+
+# === METRICS ===
+start_rerun("Operations")
+
+# === SIDEBAR LOGOUT ===
+st.sidebar.success(f"Welcome, {st.session_state.user_name}")
+if st.sidebar.button("Logout"):
+    st.session_state.clear()
+    st.switch_page("main.py")
+
+# === OPERATIONS UI ===
+st.header("🛠️ Operations")
+st.caption("Sheets API calls, cache lookups and page reruns recorded by this server process since it started.")
+
+window = st.selectbox("Time window", list(TIME_WINDOWS))
+since = time.time() - TIME_WINDOWS[window] * 60
+metrics = get_metrics()
+api_calls = metrics.frame('api', since)
+cache_lookups = metrics.frame('cache', since)
+reruns = metrics.frame('rerun', since)
+for df in (api_calls, cache_lookups):
+    df['sheet'] = df['sheet_id'].map(SHEET_NAMES).fillna(df['sheet_id'])
+quota_errors = api_calls[api_calls['error'].astype(str) == '429']
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("API calls", len(api_calls))
+col2.metric("Quota errors (429)", len(quota_errors))
+hits = cache_lookups['name'].isin(['hit', 'stale']).sum()
+col3.metric("Cache hit ratio", f"{hits / len(cache_lookups):.0%}" if len(cache_lookups) else "-")
+col4.metric("p95 rerun", f"{reruns['duration'].quantile(0.95) * 1000:.0f} ms" if len(reruns) else "-")
+
+st.markdown("---")
+st.subheader("API Calls per Minute")
+if api_calls.empty:
+    st.info("No Sheets API calls in this window.")
+else:
+    per_minute = api_calls.groupby([pd.Grouper(key='time', freq='1min'), 'name']).size().reset_index(name='Calls')
+    fig = px.bar(per_minute, x='time', y='Calls', color='name', labels={'time': 'Minute', 'name': 'Call'})
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("#### Calls by Page and Role")
+    by_page = api_calls.groupby(['page', 'role', 'name'], dropna=False).agg(
+        Calls=('duration', 'size'), Avg_ms=('duration', 'mean'), Errors=('error', 'count'),
+    ).reset_index()
+    by_page['Avg_ms'] = (by_page['Avg_ms'] * 1000).round(1)
+    st.dataframe(by_page.sort_values(by='Calls', ascending=False), hide_index=True)
+
+st.markdown("---")
+st.subheader("Cache per Sheet")
+if cache_lookups.empty:
+    st.info("No cache lookups in this window.")
+else:
+    per_sheet = pd.crosstab(cache_lookups['sheet'], cache_lookups['name'])
+    per_sheet = per_sheet.reindex(columns=['hit', 'stale', 'miss'], fill_value=0)
+    per_sheet['Hit Ratio'] = ((per_sheet['hit'] + per_sheet['stale']) / per_sheet.sum(axis=1)).round(3)
+    misses = cache_lookups[cache_lookups['name'] == 'miss'].groupby('sheet')['duration']
+    per_sheet['Avg Miss ms'] = (misses.mean() * 1000).round(1)
+    st.dataframe(per_sheet)
+
+snapshots = pd.DataFrame.from_dict(refresh_stats(), orient='index')
+if not snapshots.empty:
+    st.markdown("#### Cached Snapshots")
+    snapshots.index = snapshots.index.map(lambda sheet_id: SHEET_NAMES.get(sheet_id, sheet_id))
+    st.dataframe(snapshots)
+
+st.markdown("---")
+st.subheader("Slowest Reruns")
+if reruns.empty:
+    st.info("No page reruns in this window.")
+else:
+    per_page = reruns.groupby(['page', 'role'])['duration'].describe(percentiles=[0.5, 0.95])
+    per_page = (per_page[['count', '50%', '95%', 'max']] * [1, 1000, 1000, 1000]).round(1)
+    per_page.columns = ['Reruns', 'p50 ms', 'p95 ms', 'Max ms']
+    st.dataframe(per_page)
+    slowest = reruns.nlargest(20, 'duration')[['time', 'page', 'role', 'duration']]
+    slowest['duration'] = (slowest['duration'] * 1000).round(1)
+    st.dataframe(slowest.rename(columns={'duration': 'Duration ms'}), hide_index=True)
+
+st.markdown("---")
+st.subheader("Quota and API Errors")
+errors = api_calls[api_calls['error'].notna()]
+if errors.empty:
+    st.success("No API errors in this window.")
+else:
+    st.dataframe(
+        errors.groupby(['error', 'sheet', 'name']).size().reset_index(name='Count').sort_values(by='Count', ascending=False),
+        hide_index=True,
+    )
+    st.dataframe(errors.nlargest(20, 'time')[['time', 'page', 'role', 'sheet', 'name', 'error']], hide_index=True)
+
+backend = get_backend()
+remote = getattr(backend, 'remote', backend)
+if hasattr(remote, 'stats'):
+    st.markdown("#### Quota Client Totals")
+    st.caption("Requests sent, reads shared with an identical one in flight, retries after 429/5xx and calls that failed for good.")
+    st.json(remote.stats)
+if remote is not backend:
+    st.markdown("#### Mirror Sync")
+    st.json(backend.stats)
+    dead_letters = backend.dead_letters()
+    if dead_letters:
+        st.warning(
+            f"{len(dead_letters)} local write(s) could not be applied to Google Sheets and were set aside. "
+            "Their sheets were reloaded from Google, so redo these changes by hand if they are still needed."
+        )
+        dead_letters = pd.DataFrame(dead_letters)
+        dead_letters['Sheet'] = dead_letters['Sheet'].map(SHEET_NAMES).fillna(dead_letters['Sheet'])
+        st.dataframe(dead_letters, hide_index=True)
+
+st.markdown("---")
+st.subheader("Profiling")
+st.caption(
+    "Every rerun of the chosen users' sessions is captured with cProfile and tracemalloc until they are removed "
+    "again. Only one rerun is captured at a time, and memory figures include other sessions running meanwhile."
+)
+profiler = get_profiler()
+df_users = load_data(ALL_USERS_SHEET_ID)
+labels = {row['Gmail ID']: f"{row['User Name']} ({row['Role']}) - {row['Gmail ID']}"
+          for _, row in df_users.iterrows() if row.get('Gmail ID')}
+chosen = st.multiselect(
+    "Profile these users", sorted(set(labels) | profiler.targets),
+    default=sorted(profiler.targets), format_func=lambda gmail: labels.get(gmail, gmail),
+)
+if set(chosen) != profiler.targets:
+    profiler.targets = set(chosen)
+if profiler.skipped:
+    st.caption(f"{profiler.skipped} rerun(s) not captured because another capture was running.")
+
+if not profiler.captures:
+    st.info("No captures yet.")
+else:
+    captures = pd.DataFrame([{
+        'ID': c.id, 'Time': pd.to_datetime(c.started, unit='s'), 'Page': c.page, 'User': c.gmail,
+        'Complete': c.complete, 'Wall ms': round(c.wall * 1000, 1), 'CPU ms': round(c.cpu * 1000, 1),
+        **{f"{name} ms": round(seconds * 1000, 1) for name, seconds in c.categories.items()},
+        'Peak MiB': round(c.peak_memory / 2**20, 2),
+    } for c in reversed(profiler.captures)])
+    st.dataframe(captures, hide_index=True)
+
+    capture = profiler.find(st.selectbox("Capture", captures['ID'], format_func=lambda i: f"#{i}"))
+    if capture is not None:
+        split = pd.DataFrame({'Category': list(capture.categories), 'Seconds': list(capture.categories.values())})
+        st.plotly_chart(px.pie(split, names='Category', values='Seconds', title=f"CPU time of capture #{capture.id}"),
+                        use_container_width=True)
+        st.markdown("#### Slowest Functions")
+        st.dataframe(pd.DataFrame(capture.top_functions), hide_index=True)
+        st.markdown("#### Largest Allocations")
+        st.dataframe(pd.DataFrame(capture.allocations), hide_index=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("Download .pstats", capture.pstats, file_name=capture.filename("pstats"),
+                             mime="application/octet-stream")
+        col2.download_button("Download folded stacks", capture.folded, file_name=capture.filename("folded"),
+                             mime="text/plain")
+
+finish_rerun()
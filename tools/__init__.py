@@ -0,0 +1 @@
+"""Development tools: load tests, benchmarks and test data for the data layer."""
@@ -0,0 +1,307 @@
+"""Times the dashboards' pandas computations on school-sized data and catches regressions.
+
+Each case runs the code a page runs on one rerun (the data_access query itself,
+bypassing its st.cache_data wrapper, or a copy of the page's inline pandas) on
+a synthetic school installed straight into the sheet cache, so no backend is
+involved. Sizes:
+
+    1k    1,000 students,  100k answer rows
+    10k  10,000 students,    1M answer rows
+    50k  50,000 students,    5M answer rows (needs several GB of memory)
+
+    python -m tools.benchmarks --sizes 1k 10k
+    python -m tools.benchmarks --sizes 1k 10k --save-baseline
+    python -m tools.benchmarks --sizes 1k 10k --compare
+
+Reported per case and size: best and median time over --repeat runs and the
+tracemalloc peak of one extra run. --compare checks them against the stored
+baseline and exits with status 1 if any case got slower or bigger than
+--tolerance allows.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from tools.dataset import generate_school, to_sheet_values
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+SIZES = {
+    "1k": {"students": 1_000, "answers": 100_000},
+    "10k": {"students": 10_000, "answers": 1_000_000},
+    "50k": {"students": 50_000, "answers": 5_000_000},
+}
+# Students and teachers each case is run for, picked once per size.
+SAMPLE_USERS = 20
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["1k", "10k"])
+    parser.add_argument("--cases", nargs="+", help="only run these cases")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="fail if a case regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="allowed time and memory ratio over the baseline before a case counts as regressed")
+    parser.add_argument("--json", help="write the results to this file as JSON")
+    return parser.parse_args(argv)
+
+
+def synthetic_school(students, answers, seed=1):
+    """Returns {sheet_id: values} for a generated school (see tools/dataset.py) with an empty salary ledger."""
+    from data_access import config
+
+    values = to_sheet_values(generate_school(students=students, answers=answers, seed=seed))
+    values[config.SALARY_LEDGER_SHEET_ID] = []
+    return values
+
+
+def install_school(values_by_sheet):
+    """Puts the sheets into the process-wide cache as fresh snapshots that never expire."""
+    from data_access.store import _Snapshot, get_cache
+
+    cache = get_cache()
+    cache.ttl = float("inf")
+    for sheet_id, values in values_by_sheet.items():
+        snapshot = _Snapshot(sheet_id, values, "benchmark")
+        snapshot.version = cache.version(sheet_id) + 1
+        cache._snapshots[sheet_id] = snapshot
+    return cache
+
+
+def _uncached(func):
+    # st.cache_data wrappers expose the function they wrap.
+    return getattr(func, "__wrapped__", func)
+
+
+class Context:
+    """The loaded frames plus the sample of users every case runs for."""
+
+    def __init__(self, values_by_sheet, seed):
+        from data_access import config
+        from data_access.store import load_data
+
+        self.values = values_by_sheet
+        self.users = load_data(config.ALL_USERS_SHEET_ID)
+        self.homework = load_data(config.HOMEWORK_QUESTIONS_SHEET_ID)
+        self.live = load_data(config.MASTER_ANSWER_SHEET_ID)
+        self.bank = load_data(config.ANSWER_BANK_SHEET_ID)
+        rng = random.Random(seed)
+        students = self.users[self.users['Role'] == 'Student']
+        teachers = self.users[self.users['Role'] == 'Teacher']
+        picked = rng.sample(range(len(students)), min(SAMPLE_USERS, len(students)))
+        self.students = [(students['Gmail ID'].iloc[i], students['Class'].iloc[i]) for i in picked]
+        self.teachers = rng.sample(teachers['User Name'].tolist(), min(SAMPLE_USERS, len(teachers)))
+        self.today = datetime.today().strftime(config.DATE_FORMAT)
+
+
+def case_typed_frame(ctx):
+    """Typing MASTER_ANSWER and the Answer Bank, as on every cache fill."""
+    from data_access import config
+    from data_access.schema import typed_frame
+    from data_access.store import values_to_frame
+
+    typed_frame(config.MASTER_ANSWER_SHEET_ID, values_to_frame(ctx.values[config.MASTER_ANSWER_SHEET_ID]))
+    typed_frame(config.ANSWER_BANK_SHEET_ID, values_to_frame(ctx.values[config.ANSWER_BANK_SHEET_ID]))
+
+
+def case_pending_homework(ctx):
+    """Student Dashboard: pending homework for each sampled student."""
+    from data_access.homework import _pending_homework
+
+    compute = _uncached(_pending_homework)
+    for gmail, student_class in ctx.students:
+        compute(gmail, student_class, 0, 0, 0)
+
+
+def case_student_chart(ctx):
+    """Student Dashboard: average marks by subject from the student's bank answers."""
+    for gmail, _ in ctx.students:
+        answers = ctx.bank[ctx.bank.get('Student Gmail') == gmail]
+        answers.dropna(subset=['Marks']).groupby('Subject', observed=True)['Marks'].mean().round(2).reset_index()
+
+
+def case_grading_filters(ctx):
+    """Teacher Dashboard, Grade Answers: ungraded answers to the teacher's questions and their students."""
+    df_students = ctx.users[ctx.users['Role'] == 'Student']
+    for teacher in ctx.teachers:
+        my_questions = ctx.homework[ctx.homework.get('Uploaded By') == teacher]['Question'].tolist()
+        answers_to_my_questions = ctx.live[ctx.live['Question'].isin(my_questions)]
+        ungraded = answers_to_my_questions[answers_to_my_questions['Marks'].isna()]
+        student_gmails = ungraded['Student Gmail'].unique().tolist()
+        gradable = df_students[df_students['Gmail ID'].isin(student_gmails)].copy()
+        if not gradable.empty:
+            gradable['display_name'] = gradable.apply(
+                lambda row: f"{row['User Name']} ({row['Class']})" if row.get('Class') else row['User Name'], axis=1)
+
+
+def case_homework_pivot(ctx):
+    """Teacher Dashboard: the class-by-subject summary of today's homework."""
+    import pandas as pd
+
+    for teacher in ctx.teachers:
+        todays = ctx.homework[(ctx.homework.get('Uploaded By') == teacher) & (ctx.homework.get('Date') == ctx.today)]
+        if not todays.empty:
+            pd.pivot_table(todays, index='Class', columns='Subject', aggfunc='size', fill_value=0, observed=True)
+
+
+def case_leaderboard_build(ctx):
+    """Folding the whole Answer Bank into a fresh leaderboard, as after a restart."""
+    from data_access import config
+    from data_access.leaderboard import Leaderboard
+    from data_access.store import get_cache
+
+    cache = get_cache()
+    Leaderboard().sync(cache.get(config.ANSWER_BANK_SHEET_ID), cache.get(config.ALL_USERS_SHEET_ID))
+
+
+def case_leaderboard_queries(ctx):
+    """Class top 3, the student's rank and the per-class top 3 on an up-to-date leaderboard."""
+    from data_access.leaderboard import class_leaderboard, student_rank, top_students
+
+    for gmail, student_class in ctx.students:
+        class_leaderboard(student_class, n=3)
+        student_rank(gmail, student_class)
+    top_students(3)
+
+
+def case_teacher_activity(ctx):
+    """Principal Dashboard: questions created today and pending answers per staff member."""
+    from data_access.reports import _teacher_activity
+
+    _uncached(_teacher_activity)(ctx.today, 0, 0, 0)
+
+
+def case_weakest_students(ctx):
+    """Principal Dashboard: the five students with the lowest average marks."""
+    import pandas as pd
+
+    df_students = ctx.users[ctx.users['Role'] == 'Student']
+    graded = ctx.bank.dropna(subset=['Marks'])
+    performance = graded.groupby('Student Gmail', observed=True)['Marks'].mean().reset_index()
+    merged = pd.merge(performance, df_students, left_on='Student Gmail', right_on='Gmail ID')
+    merged.nsmallest(5, 'Marks').round({'Marks': 2})
+
+
+CASES = {
+    "typed_frame": case_typed_frame,
+    "pending_homework": case_pending_homework,
+    "student_chart": case_student_chart,
+    "grading_filters": case_grading_filters,
+    "homework_pivot": case_homework_pivot,
+    "leaderboard_build": case_leaderboard_build,
+    "leaderboard_queries": case_leaderboard_queries,
+    "teacher_activity": case_teacher_activity,
+    "weakest_students": case_weakest_students,
+}
+
+
+def measure(case, ctx, repeat):
+    """Returns {'best_ms', 'median_ms', 'peak_mb'} for one case."""
+    case(ctx)  # warm-up: first-touch lookups and lazily built indexes
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        case(ctx)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    case(ctx)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'best_ms': round(min(times) * 1000, 2),
+        'median_ms': round(statistics.median(times) * 1000, 2),
+        'peak_mb': round(peak / 2 ** 20, 2),
+    }
+
+
+def run_benchmarks(args):
+    os.environ["BACKGROUND_REFRESH"] = "0"
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    cases = {name: CASES[name] for name in (args.cases or CASES)}
+    results = {}
+    for size in args.sizes:
+        start = time.perf_counter()
+        values = synthetic_school(seed=args.seed, **SIZES[size])
+        install_school(values)
+        ctx = Context(values, args.seed)
+        print(f"[{size}] data ready in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+        results[size] = {}
+        for name, case in cases.items():
+            results[size][name] = measure(case, ctx, args.repeat)
+            print(f"[{size}] {name}: {results[size][name]}", file=sys.stderr)
+        del ctx, values
+        gc.collect()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns [(size, case, metric, baseline, current)] for every measurement over the tolerance."""
+    regressions = []
+    for size, cases in results.items():
+        for name, current in cases.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            for metric in ('best_ms', 'peak_mb'):
+                # Tiny measurements are mostly noise; don't flag them.
+                floor = 1.0 if metric == 'best_ms' else 0.5
+                if current[metric] > max(before[metric], floor) * tolerance:
+                    regressions.append((size, name, metric, before[metric], current[metric]))
+    return regressions
+
+
+def print_report(results, baseline=None):
+    print(f"{'size':<6}{'case':<22}{'best ms':>11}{'median ms':>11}{'peak MB':>10}{'vs base':>9}")
+    for size, cases in results.items():
+        for name, row in cases.items():
+            before = (baseline or {}).get(size, {}).get(name)
+            ratio = f"{row['best_ms'] / before['best_ms']:.2f}x" if before and before['best_ms'] else "-"
+            print(f"{size:<6}{name:<22}{row['best_ms']:>11}{row['median_ms']:>11}{row['peak_mb']:>10}{ratio:>9}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        # Keep the stored numbers for sizes this run did not cover.
+        merged = dict(baseline or {})
+        for size, cases in results.items():
+            merged.setdefault(size, {}).update(cases)
+        with open(args.baseline, "w") as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+    if args.compare:
+        if baseline is None:
+            sys.exit(f"no baseline at {args.baseline}; run with --save-baseline first")
+        regressions = compare(results, baseline, args.tolerance)
+        for size, name, metric, before, now in regressions:
+            print(f"REGRESSION [{size}] {name} {metric}: {before} -> {now}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Generates a consistent synthetic school for all five spreadsheets.
+
+Users, homework, live answers, the Answer Bank and announcements use the
+column layouts the pages expect and agree with each other: every student
+answers homework of their own class, every question was uploaded by the
+teacher who owns that class and subject, and an answer is either still in
+MASTER_ANSWER (ungraded, or graded with remarks and awaiting a correction) or
+in the Answer Bank, never both. Columns are built with numpy, so millions of
+answer rows take seconds.
+
+    python -m tools.dataset --students 10000 --answers 1000000 --out school/ --format parquet
+    python -m tools.dataset --students 500 --answers 20000 --format json --out seed.json
+    python -m tools.dataset --students 500 --answers 20000 --sqlite local_sheets.db
+
+The JSON format is a FAKE_GSPREAD_SEED file for the fake Sheets client. Every
+generated user's password is PASSWORD.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+PASSWORD = "1234"
+# Same as data_access.config.DATE_FORMAT; importing data_access here would read its settings too early.
+DATE_FORMAT = "%d-%m-%Y"
+SUBJECTS = ["Math", "Science", "English", "Hindi", "Social Science"]
+SUBSCRIPTION_PLAN = "₹2000 for 1 year (With Advance Classes)"
+
+USERS_HEADER = [
+    "User Name", "Father Name", "Gmail ID", "Mobile Number", "Class", "Password", "Subscription Plan",
+    "Security Question", "Security Answer", "Role", "Payment Confirmed", "Subscription Date", "Subscribed Till",
+    "Parent PhonePe", "Confirmed", "Salary Points", "Instruction", "Instruction_Reply", "Instruction_Status",
+    "Instructions",
+]
+HOMEWORK_HEADER = ["Class", "Date", "Uploaded By", "Subject", "Question"]
+ANSWER_HEADER = ["Student Gmail", "Date", "Class", "Subject", "Question", "Answer", "Marks", "Remarks"]
+ANNOUNCEMENTS_HEADER = ["Message", "Date"]
+
+
+def class_names(classes):
+    """Returns the first `classes` class names, from 6th up."""
+    return [f"{6 + c}th" for c in range(classes)]
+
+
+def _dates(end, days):
+    # Newest first, formatted the way the sheets store them.
+    return np.array([(end - timedelta(days=d)).strftime(DATE_FORMAT) for d in range(days)], dtype=object)
+
+
+def _users(rng, students, student_class, teachers, end):
+    password = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    n = students + teachers + 2
+    cols = {name: np.full(n, "", dtype=object) for name in USERS_HEADER}
+    s = np.arange(students)
+    t = np.arange(teachers)
+    cols["User Name"] = np.concatenate([
+        np.char.add("Student ", s.astype(str)).astype(object),
+        np.char.add("Teacher ", t.astype(str)).astype(object),
+        ["Admin", "Principal"],
+    ]).astype(object)
+    cols["Gmail ID"] = np.concatenate([
+        np.char.add(np.char.add("student", s.astype(str)), "@school.test").astype(object),
+        np.char.add(np.char.add("teacher", t.astype(str)), "@school.test").astype(object),
+        ["admin@school.test", "principal@school.test"],
+    ]).astype(object)
+    cols["Role"] = np.array(["Student"] * students + ["Teacher"] * teachers + ["Admin", "Principal"], dtype=object)
+    cols["Password"][:] = password
+    cols["Mobile Number"] = (9_000_000_000 + rng.integers(0, 999_999_999, n)).astype(str).astype(object)
+    cols["Class"][:students] = student_class
+    cols["Father Name"][:students] = np.char.add("Parent ", s.astype(str)).astype(object)
+    cols["Subscription Plan"][:students] = SUBSCRIPTION_PLAN
+    cols["Security Question"][:] = "What city were you born in?"
+    cols["Security Answer"][:] = "bargawan"
+    cols["Parent PhonePe"][:students] = cols["Mobile Number"][:students]
+    # Subscriptions started some time in the last year; a few students still await payment.
+    started = rng.integers(0, 365, students)
+    paid = rng.random(students) >= 0.02
+    starts = _dates(end, 365)[started]
+    tills = np.array([(end + timedelta(days=365 - d)).strftime(DATE_FORMAT) for d in range(365)], dtype=object)[started]
+    cols["Payment Confirmed"][:students] = np.where(paid, "Yes", "No")
+    cols["Subscription Date"][:students] = np.where(paid, starts, "")
+    cols["Subscribed Till"][:students] = np.where(paid, tills, "")
+    cols["Confirmed"][students:] = "Yes"
+    cols["Salary Points"][students:] = "0"
+    return pd.DataFrame(cols, columns=USERS_HEADER)
+
+
+def _homework(classes, subjects, teacher_names, dates, questions_per_day):
+    # Sorted by class, so each class's questions are one contiguous block.
+    c, d, s, q = np.meshgrid(
+        np.arange(len(classes)), np.arange(len(dates)), np.arange(len(subjects)), np.arange(questions_per_day),
+        indexing="ij",
+    )
+    c, d, s, q = c.ravel(), d.ravel(), s.ravel(), q.ravel()
+    class_col = np.array(classes, dtype=object)[c]
+    subject_col = np.array(subjects, dtype=object)[s]
+    # Each (class, subject) belongs to one teacher.
+    owner = np.array(teacher_names, dtype=object)[(c * len(subjects) + s) % len(teacher_names)]
+    number = (d * questions_per_day + q + 1).astype(str).astype(object)
+    question = class_col + " " + subject_col + " question " + number
+    return pd.DataFrame({
+        "Class": class_col, "Date": dates[d], "Uploaded By": owner, "Subject": subject_col, "Question": question,
+    }, columns=HOMEWORK_HEADER)
+
+
+def _answer_pairs(rng, answers, student_class_idx, class_start, class_size):
+    """Returns (student, homework row) index pairs, each pair at most once, in random order."""
+    students = len(student_class_idx)
+    capacity = int(class_size[student_class_idx].sum())
+    answers = min(answers, capacity)
+    pairs = np.empty(0, dtype=np.int64)
+    width = int(class_start[-1] + class_size[-1])
+    while len(pairs) < answers:
+        draw = int((answers - len(pairs)) * 1.1) + 16
+        s = rng.integers(0, students, draw)
+        c = student_class_idx[s]
+        h = class_start[c] + (rng.random(draw) * class_size[c]).astype(np.int64)
+        pairs = np.unique(np.concatenate([pairs, s * width + h]))
+    pairs = rng.permutation(pairs)[:answers]
+    return pairs // width, pairs % width
+
+
+def generate_school(students=1000, answers=100_000, classes=7, subjects=None, teachers=None, days=120,
+                    questions_per_day=1, backlog=0.1, corrections=0.02, announcements=30, end_date=None, seed=1):
+    """Returns {sheet name: DataFrame of strings} for the five spreadsheets.
+
+    students, answers: users with Role "Student", and answer rows across
+        MASTER_ANSWER and the Answer Bank (capped at one answer per student
+        and question).
+    classes, subjects: how many classes (6th, 7th, ...) and which subjects.
+    teachers: defaults to one per 100 students, at least two.
+    days, questions_per_day: homework is set for every class and subject on
+        each of the `days` days up to `end_date` (default today).
+    backlog: share of the answers still ungraded in MASTER_ANSWER.
+    corrections: share of the answers in MASTER_ANSWER graded with remarks,
+        waiting for the student to correct them.
+    """
+    rng = np.random.default_rng(seed)
+    end = end_date or datetime.today()
+    subjects = subjects or SUBJECTS
+    classes = class_names(classes)
+    teachers = teachers or max(2, students // 100)
+    teacher_names = [f"Teacher {j}" for j in range(teachers)]
+    dates = _dates(end, days)
+
+    student_class_idx = np.arange(students) % len(classes)
+    users = _users(rng, students, np.array(classes, dtype=object)[student_class_idx], teachers, end)
+    homework = _homework(classes, subjects, teacher_names, dates, questions_per_day)
+
+    per_class = len(dates) * len(subjects) * questions_per_day
+    class_start = np.arange(len(classes), dtype=np.int64) * per_class
+    class_size = np.full(len(classes), per_class, dtype=np.int64)
+    student, row = _answer_pairs(rng, answers, student_class_idx, class_start, class_size)
+    n = len(student)
+    answer_cols = {
+        "Student Gmail": users["Gmail ID"].to_numpy()[student],
+        "Date": homework["Date"].to_numpy()[row],
+        "Class": homework["Class"].to_numpy()[row],
+        "Subject": homework["Subject"].to_numpy()[row],
+        "Question": homework["Question"].to_numpy()[row],
+        "Answer": np.char.add("Answer ", np.arange(n).astype(str)).astype(object),
+        "Marks": rng.integers(1, 6, n).astype(str).astype(object),
+        "Remarks": np.full(n, "", dtype=object),
+    }
+    answers_df = pd.DataFrame(answer_cols, columns=ANSWER_HEADER)
+    live_count = int(n * (backlog + corrections))
+    live = answers_df.iloc[:live_count].copy()
+    bank = answers_df.iloc[live_count:]
+    # Ungraded answers have no marks; corrections keep low marks and a remark.
+    ungraded = np.arange(live_count) < int(n * backlog)
+    live.loc[ungraded, "Marks"] = ""
+    live.loc[~ungraded, "Marks"] = rng.integers(1, 4, int((~ungraded).sum())).astype(str)
+    live.loc[~ungraded, "Remarks"] = "Please show your working."
+    # Sheets keep rows in the order they were written: oldest first.
+    age = {date: d for d, date in enumerate(dates)}
+
+    def oldest_first(df):
+        order = np.argsort(-df["Date"].map(age).to_numpy(), kind="stable")
+        return df.iloc[order].reset_index(drop=True)
+
+    notices = pd.DataFrame({
+        "Message": [f"Announcement {k}" for k in range(announcements)],
+        "Date": dates[np.linspace(0, len(dates) - 1, announcements).astype(int)] if announcements else [],
+    }, columns=ANNOUNCEMENTS_HEADER)
+    return {
+        "ALL_USERS": users,
+        "HOMEWORK_QUESTIONS": oldest_first(homework),
+        "MASTER_ANSWER": oldest_first(live),
+        "ANSWER_BANK": oldest_first(bank),
+        # The Principal inserts new announcements at the top.
+        "ANNOUNCEMENTS": notices,
+    }
+
+
+def sheet_ids():
+    """Returns {sheet name: sheet ID} as configured in data_access."""
+    from data_access import config
+
+    return {
+        "ALL_USERS": config.ALL_USERS_SHEET_ID,
+        "HOMEWORK_QUESTIONS": config.HOMEWORK_QUESTIONS_SHEET_ID,
+        "MASTER_ANSWER": config.MASTER_ANSWER_SHEET_ID,
+        "ANSWER_BANK": config.ANSWER_BANK_SHEET_ID,
+        "ANNOUNCEMENTS": config.ANNOUNCEMENTS_SHEET_ID,
+    }
+
+
+def to_values(df):
+    """Returns a frame as the [header, row, ...] cell lists a sheet holds."""
+    return [list(df.columns)] + df.to_numpy().tolist()
+
+
+def to_sheet_values(school):
+    """Returns {sheet ID: values} for a generated school."""
+    ids = sheet_ids()
+    return {ids[name]: to_values(df) for name, df in school.items()}
+
+
+def write_backend(school, backend):
+    """Replaces the five sheets in `backend` (any data_access SheetBackend) with the school."""
+    for sheet_id, values in to_sheet_values(school).items():
+        backend.replace_all(sheet_id, values)
+
+
+def write_files(school, out, fmt="csv"):
+    """Writes one <SHEET NAME>.csv / .parquet per sheet into `out`, or a seed JSON file at `out`."""
+    if fmt == "json":
+        with open(out, "w") as f:
+            json.dump(to_sheet_values(school), f)
+        return
+    os.makedirs(out, exist_ok=True)
+    for name, df in school.items():
+        path = os.path.join(out, f"{name}.{fmt}")
+        if fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--answers", type=int, default=100_000)
+    parser.add_argument("--classes", type=int, default=7)
+    parser.add_argument("--teachers", type=int, help="default: one per 100 students")
+    parser.add_argument("--days", type=int, default=120, help="days of homework, ending today")
+    parser.add_argument("--questions-per-day", type=int, default=1, help="per class and subject")
+    parser.add_argument("--backlog", type=float, default=0.1, help="share of answers still ungraded")
+    parser.add_argument("--corrections", type=float, default=0.02, help="share of answers awaiting correction")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--format", choices=["csv", "parquet", "json"], default="csv")
+    parser.add_argument("--out", help="output directory (csv, parquet) or file (json)")
+    parser.add_argument("--sqlite", help="write into this SQLite file through SQLiteBackend instead")
+    args = parser.parse_args(argv)
+    if not args.out and not args.sqlite:
+        parser.error("give --out or --sqlite")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    school = generate_school(
+        students=args.students, answers=args.answers, classes=args.classes, teachers=args.teachers,
+        days=args.days, questions_per_day=args.questions_per_day, backlog=args.backlog,
+        corrections=args.corrections, seed=args.seed,
+    )
+    generated = time.perf_counter() - start
+    if args.sqlite:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from data_access.backends import SQLiteBackend
+
+        write_backend(school, SQLiteBackend(args.sqlite))
+    else:
+        write_files(school, args.out, args.format)
+    rows = ", ".join(f"{name} {len(df):,}" for name, df in school.items())
+    print(f"{rows} rows; generated in {generated:.1f} s, written in {time.perf_counter() - start - generated:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+"""Drives the real pages with simulated students and teachers and reports how they cope.
+
+Every simulated user runs in its own thread through Streamlit's AppTest:
+students log in through main.py, open the Student Dashboard and submit an
+answer, while teachers open the Teacher Dashboard and grade one. The data lives
+in the in-memory fake Sheets client (optionally slowed down and throttled like
+the real API) or in a throw-away SQLite file, seeded with a small school.
+
+    python -m tools.load_test --students 30 --teachers 3 --rounds 2 --latency 0.2
+
+Reported: p50/p95 rerun latency per action, backend calls per action (measured
+one user at a time first) and for the whole concurrent run, and peak memory.
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from tools.dataset import ANSWER_HEADER, HOMEWORK_HEADER, PASSWORD, USERS_HEADER
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES = ["Ganesh_logo.png", "PRK_logo.jpg", "Excellent_logo.jpg", "Qr logo.jpg"]
+# 1x1 transparent PNG, standing in for the logos the pages show.
+PLACEHOLDER_IMAGE = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+DASHBOARDS = {"student": "pages/1_Student_Dashboard.py", "teacher": "pages/2_Teacher_Dashboard.py"}
+BACKEND_METHODS = [
+    "get_all_values", "get_rows", "get_revision", "row_values", "find_row",
+    "update_cell", "batch_update", "append_rows", "insert_row", "delete_rows", "delete_rows_at", "replace_all",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--teachers", type=int, default=2)
+    parser.add_argument("--classes", type=int, default=4, help="classes the students are spread over")
+    parser.add_argument("--rounds", type=int, default=1, help="times each user repeats their flow")
+    parser.add_argument("--backend", choices=["fake", "sqlite"], default="fake")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per fake Sheets request")
+    parser.add_argument("--reads-per-minute", type=int, default=0, help="fake read quota; 0 = unlimited")
+    parser.add_argument("--grade", default="Good",
+                        help="grade teachers give; 'Good' edits answers in place, 'Very Good' moves them to the bank")
+    parser.add_argument("--trace-memory", action="store_true", help="also report the tracemalloc peak (slower)")
+    parser.add_argument("--json", help="write the results to this file as JSON")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir):
+    """Points data_access at the chosen backend; must run before it is imported."""
+    if args.backend == "sqlite":
+        os.environ["DATA_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(workdir, "load_test.db")
+    else:
+        os.environ["DATA_BACKEND"] = "gspread"
+        os.environ["SHEETS_CLIENT"] = "fake"
+        os.environ["FAKE_GSPREAD_LATENCY"] = str(args.latency)
+        os.environ["FAKE_GSPREAD_READS_PER_MINUTE"] = str(args.reads_per_minute)
+    # The pages show logos relative to the working directory.
+    for name in IMAGES:
+        source = os.path.join(REPO_ROOT, name)
+        with open(os.path.join(workdir, name), "wb") as f:
+            if os.path.exists(source):
+                with open(source, "rb") as image:
+                    f.write(image.read())
+            else:
+                f.write(PLACEHOLDER_IMAGE)
+    os.chdir(workdir)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def seed_school(backend, students, teachers, classes):
+    """Writes users, today's homework, some graded history and an announcement.
+
+    Each teacher owns the classes whose number modulo `teachers` is theirs, so
+    concurrent graders never touch the same answers.
+    """
+    import hashlib
+
+    from data_access import config
+
+    today = datetime.today()
+    fmt = config.DATE_FORMAT
+    password = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    class_names = [f"{6 + c}th" for c in range(classes)]
+
+    def user(**cells):
+        return [cells.get(column, "") for column in USERS_HEADER]
+
+    student_rows, teacher_rows = [], []
+    for i in range(students):
+        student_rows.append(user(**{
+            "User Name": f"Student {i}", "Gmail ID": f"student{i}@load.test", "Class": class_names[i % classes],
+            "Password": password, "Role": "Student", "Payment Confirmed": "Yes",
+            "Subscription Date": today.strftime(fmt), "Subscribed Till": (today + timedelta(days=30)).strftime(fmt),
+        }))
+    for j in range(teachers):
+        teacher_rows.append(user(**{
+            "User Name": f"Teacher {j}", "Gmail ID": f"teacher{j}@load.test", "Password": password,
+            "Role": "Teacher", "Confirmed": "Yes", "Salary Points": "0",
+        }))
+    backend.replace_all(config.ALL_USERS_SHEET_ID, [USERS_HEADER] + student_rows + teacher_rows)
+
+    homework, bank = [HOMEWORK_HEADER], [ANSWER_HEADER]
+    for c, class_name in enumerate(class_names):
+        teacher = f"Teacher {c % max(teachers, 1)}"
+        for k in range(3):
+            homework.append([class_name, today.strftime(fmt), teacher, "Math", f"{class_name} question {k}"])
+        old_date = (today - timedelta(days=7)).strftime(fmt)
+        homework.append([class_name, old_date, teacher, "Science", f"{class_name} revision"])
+        for i in range(c, students, classes):
+            bank.append([f"student{i}@load.test", old_date, class_name, "Science", f"{class_name} revision",
+                         "answer", str(1 + i % 5), ""])
+    backend.replace_all(config.HOMEWORK_QUESTIONS_SHEET_ID, homework)
+    backend.replace_all(config.MASTER_ANSWER_SHEET_ID, [ANSWER_HEADER])
+    backend.replace_all(config.ANSWER_BANK_SHEET_ID, bank)
+    backend.replace_all(config.ANNOUNCEMENTS_SHEET_ID, [["Message", "Date"], ["Load test", today.strftime(fmt)]])
+    students = [(f"student{i}@load.test", f"Student {i}") for i in range(students)]
+    teachers = [(f"teacher{j}@load.test", f"Teacher {j}") for j in range(teachers)]
+    return students, teachers
+
+
+class CallCounter:
+    """Counts backend calls by method by wrapping them on the backend instance."""
+
+    def __init__(self, backend):
+        self.counts = {}
+        self._lock = threading.Lock()
+        for name in BACKEND_METHODS:
+            setattr(backend, name, self._wrap(name, getattr(backend, name)))
+
+    def _wrap(self, name, method):
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.counts[name] = self.counts.get(name, 0) + 1
+            return method(*args, **kwargs)
+        return counted
+
+    def total(self):
+        with self._lock:
+            return sum(self.counts.values())
+
+
+class Recorder:
+    """Collects per-action rerun latencies, backend call deltas and failures."""
+
+    def __init__(self, counter=None):
+        self.counter = counter
+        self.latencies = {}
+        self.calls = {}
+        self.failures = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def run(self, action, app):
+        """Runs one AppTest rerun (or a widget interaction's rerun) and records it."""
+        before = self.counter.total() if self.counter else 0
+        start = time.perf_counter()
+        app = app()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.setdefault(action, []).append(elapsed)
+            if self.counter:
+                self.calls.setdefault(action, []).append(self.counter.total() - before)
+        if app.exception:
+            self.fail(action, app.exception[0].message)
+        return app
+
+    def fail(self, action, detail=""):
+        with self._lock:
+            self.failures[action] = self.failures.get(action, 0) + 1
+            # Keep a few distinct messages per action for the report.
+            seen = self.errors.setdefault(action, [])
+            if detail and detail not in seen and len(seen) < 3:
+                seen.append(detail)
+
+
+def share_apptest_runtime():
+    """Lets several AppTests run at once in one process.
+
+    AppTest installs a mock Runtime singleton for the length of each run and
+    clears it afterwards, which breaks runs still going in other threads. Here
+    a run whose runtime was cleared keeps getting the last one installed, and
+    the "appTest" config override is applied once for the whole process.
+    Script compilation is serialized too: ast.parse is not safe to call from
+    several threads at once on every Python version.
+
+    AppTest also resets PagesManager.uses_pages_directory before every run,
+    and a run that reads it while it is unset executes main.py without its
+    pages, so clicks land on widgets that no longer exist. Every run here
+    starts from main.py, so the flag is pinned and AppTest resets a
+    subclass's copy instead.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner import magic
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import patch_config_options
+
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last['runtime'] = cls._instance
+            return cls._instance
+        if 'runtime' in last:
+            return last['runtime']
+        raise RuntimeError("Runtime hasn't been created!")
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or 'runtime' in last)
+    patch_config_options({"global.appTest": True}).__enter__()
+
+    add_magic = magic.add_magic
+    compile_lock = threading.Lock()
+
+    def locked_add_magic(code, script_path):
+        with compile_lock:
+            return add_magic(code, script_path)
+
+    magic.add_magic = locked_add_magic
+
+    PagesManager.uses_pages_directory = True
+    app_test.PagesManager = type("PagesManager", (PagesManager,), {})
+
+
+def open_dashboard(recorder, user, role):
+    """Opens the role's dashboard for a logged-in user and returns its AppTest.
+
+    The first run goes through main.py, which switches to the dashboard as in
+    the app. Later reruns start on the dashboard itself: a rerun that starts in
+    main.py spends the clicked button's trigger before switching pages.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(REPO_ROOT, "main.py"), default_timeout=120)
+    app.session_state["logged_in"] = True
+    app.session_state["user_role"] = role
+    app.session_state["user_gmail"] = user[0]
+    app.session_state["user_name"] = user[1]
+    recorder.run(f"{role}_dashboard", app.run)
+    return app.switch_page(DASHBOARDS[role])
+
+
+def _by_label(widgets, label):
+    return [w for w in widgets if w.label == label]
+
+
+def student_flow(recorder, user, rounds):
+    from streamlit.testing.v1 import AppTest
+
+    for _ in range(rounds):
+        login = AppTest.from_file(os.path.join(REPO_ROOT, "main.py"), default_timeout=120)
+        recorder.run("open_login", login.run)
+        _by_label(login.text_input, "Username (Your Gmail ID)")[0].input(user[0])
+        _by_label(login.text_input, "PIN (Your Password)")[0].input(PASSWORD)
+        recorder.run("login", _by_label(login.button, "Login")[0].click().run)
+        if not ("logged_in" in login.session_state and login.session_state["logged_in"]):
+            recorder.fail("login", "; ".join(str(e.value) for e in login.error) or "not logged in")
+            continue
+        dashboard = open_dashboard(recorder, user, "student")
+        answers = _by_label(dashboard.text_area, "Your Answer:")
+        if answers:
+            answers[0].input(f"answer from {user[1]} at {time.time():.0f}")
+            recorder.run("submit_answer", _by_label(dashboard.button, "Submit Answer")[0].click().run)
+
+
+def teacher_flow(recorder, user, rounds, grade, wait=30):
+    """Grades one answer per round, waiting up to `wait` seconds for students to submit."""
+    for _ in range(rounds):
+        dashboard = open_dashboard(recorder, user, "teacher")
+        tabs = [r for r in dashboard.radio if "Grade Answers" in r.options]
+        if not tabs:
+            recorder.fail("teacher_dashboard")
+            continue
+        recorder.run("open_grading", tabs[0].set_value("Grade Answers").run)
+        students = _by_label(dashboard.selectbox, "Select Student")
+        deadline = time.monotonic() + wait
+        while (not students or len(students[0].options) < 2) and time.monotonic() < deadline:
+            time.sleep(1)
+            recorder.run("open_grading", dashboard.run)
+            students = _by_label(dashboard.selectbox, "Select Student")
+        if not students or len(students[0].options) < 2:
+            continue
+        # The student list has no widget key, so a submission that changes its
+        # options between our rerun and the selection resets it; select again.
+        for _ in range(3):
+            recorder.run("select_student", students[0].set_value(students[0].options[1]).run)
+            grades = _by_label(dashboard.selectbox, "Grade")
+            students = _by_label(dashboard.selectbox, "Select Student")
+            if grades or not students or len(students[0].options) < 2:
+                break
+        if not grades:
+            recorder.fail("select_student", "no answers shown for the selected student")
+            continue
+        grades[0].set_value(grade)
+        recorder.run("save_grade", _by_label(dashboard.button, "Save Grade")[0].click().run)
+        remarks = _by_label(dashboard.text_area, "Remarks/Feedback (Required)")
+        if remarks:
+            remarks[0].input("Checked in load test")
+            recorder.run("save_grade", _by_label(dashboard.button, "Save Grade")[0].click().run)
+
+
+def guarded(flow):
+    """Wraps a user flow so an exception (e.g. an AppTest timeout) is counted instead of killing the thread."""
+    def run(recorder, *args):
+        try:
+            flow(recorder, *args)
+        except Exception as e:
+            recorder.fail(flow.__name__, f"{type(e).__name__}: {e}")
+    return run
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_load_test(args):
+    """Seeds the data, calibrates one user at a time, then runs everyone at once."""
+    workdir = tempfile.mkdtemp(prefix="prk_load_test_")
+    configure_environment(args, workdir)
+    if args.trace_memory:
+        tracemalloc.start()
+
+    import data_access
+
+    backend = data_access.get_backend()
+    students, teachers = seed_school(backend, args.students, args.teachers, args.classes)
+    counter = CallCounter(backend)
+
+    # One student and one teacher on their own: how many backend calls each action costs.
+    calibration = Recorder(counter)
+    if students:
+        student_flow(calibration, students[0], 1)
+    if teachers:
+        teacher_flow(calibration, teachers[0], 1, args.grade)
+
+    share_apptest_runtime()
+    recorder = Recorder(counter)
+    calls_before = counter.total()
+    counts_before = dict(counter.counts)
+    threads = [threading.Thread(target=guarded(student_flow), args=(recorder, s, args.rounds)) for s in students[1:]]
+    threads += [threading.Thread(target=guarded(teacher_flow), args=(recorder, t, args.rounds, args.grade)) for t in teachers]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    reruns = sum(len(v) for v in recorder.latencies.values())
+
+    results = {
+        'config': {k: v for k, v in vars(args).items() if k != 'json'},
+        'wall_seconds': round(wall, 2),
+        'concurrent_users': len(threads),
+        'actions': {
+            action: {
+                'count': len(times),
+                'p50_ms': round(_percentile(times, 50) * 1000, 1),
+                'p95_ms': round(_percentile(times, 95) * 1000, 1),
+                'calls_per_action': statistics.mean(calibration.calls[action]) if action in calibration.calls else None,
+                'failures': recorder.failures.get(action, 0),
+            }
+            for action, times in sorted(recorder.latencies.items())
+        },
+        'backend_calls': {
+            'total': counter.total() - calls_before,
+            'per_rerun': round((counter.total() - calls_before) / max(reruns, 1), 2),
+            'by_method': {k: v - counts_before.get(k, 0) for k, v in sorted(counter.counts.items())},
+        },
+        'errors': recorder.errors,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+    client = getattr(getattr(backend, 'backend', None), 'client', None)
+    if client is not None and hasattr(client, 'calls'):
+        # Requests that reached the (fake) API, after coalescing and retries.
+        results['api_requests'] = dict(client.calls)
+    if args.trace_memory:
+        results['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    return results
+
+
+def print_report(results):
+    print(f"{results['concurrent_users']} concurrent users, {results['wall_seconds']} s wall time")
+    print(f"{'action':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'calls':>8}{'fail':>6}")
+    for action, row in results['actions'].items():
+        calls = "-" if row['calls_per_action'] is None else f"{row['calls_per_action']:.1f}"
+        print(f"{action:<20}{row['count']:>7}{row['p50_ms']:>10}{row['p95_ms']:>10}{calls:>8}{row['failures']:>6}")
+    calls = results['backend_calls']
+    print(f"backend calls: {calls['total']} total, {calls['per_rerun']} per rerun, {calls['by_method']}")
+    if 'api_requests' in results:
+        print(f"API requests: {results['api_requests']}")
+    for action, messages in results['errors'].items():
+        print(f"errors in {action}: {messages}")
+    print(f"peak RSS: {results['peak_rss_mb']} MB" + (
+        f", traced peak: {results['traced_peak_mb']} MB" if 'traced_peak_mb' in results else ""))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.json:
+        # run_load_test changes into a scratch directory.
+        args.json = os.path.abspath(args.json)
+    results = run_load_test(args)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()